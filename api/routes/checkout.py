@@ -1,11 +1,29 @@
+import asyncio
+import hashlib
+import json
+import time
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 
-from db.session import get_db
+from api.settings import api_settings
+from db.session import SessionLocal, get_db
 from db.models import Charge
 from api.schemas import CheckoutRequest, ChargeResponse
-from workers.tasks import create_woovi_charge_task
+from workers.services.charge_events import (
+    cache_charge,
+    charge_channel,
+    get_cached_charge,
+    publish_charge,
+    serialize_charge,
+)
+from workers.services.redis_client import get_async_redis
+from workers.services.woovi import build_charge_payload, charge_fields, create_pix_charge, log_time_to_qr
+from workers.queue import create_woovi_charge_task
 
 router = APIRouter()
 
@@ -28,15 +46,132 @@ def create_checkout(payload: CheckoutRequest, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(charge)
     
+    # Fast path: tenta gerar o PIX na própria requisição, com prazo curto
+    if api_settings.checkout_fast_pix and try_fast_pix(charge, db):
+        return charge
+
     # Queue Woovi API call
     create_woovi_charge_task.send(charge.id)
     
     return charge
 
-@router.get("/checkout/{charge_id}", response_model=ChargeResponse)
-def get_checkout_status(charge_id: int, db: Session = Depends(get_db)):
-    charge = db.get(Charge, charge_id)
-    if not charge:
+def try_fast_pix(charge: Charge, db: Session) -> bool:
+    """
+    Creates the Woovi charge within CHECKOUT_FAST_PIX_TIMEOUT seconds in total
+    (rate limiter wait, POST and the lookup of an existing charge share one
+    deadline), so the request thread is held for at most that long.
+    Returns False on any failure so the caller falls back to the queued actor
+    (a charge created by a timed-out call is fetched again by correlationID).
+    """
+    deadline = time.monotonic() + api_settings.checkout_fast_pix_timeout
+    try:
+        result = create_pix_charge(build_charge_payload(charge), deadline=deadline)
+        for field, value in charge_fields(result).items():
+            setattr(charge, field, value)
+        if not charge.br_code:
+            raise ValueError("Woovi response without brCode")
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"CHECKOUT: fast path falhou para {charge.correlation_id}, usando fila: {e}")
+        return False
+
+    log_time_to_qr(charge, "fast path")
+    publish_charge(charge)
+    return True
+
+@router.get(
+    "/checkout/{charge_id}",
+    # A rota devolve o JSON do cache direto (Response): o modelo só documenta o corpo
+    responses={
+        200: {"model": ChargeResponse},
+        304: {"description": "Charge unchanged since the ETag sent in If-None-Match"},
+    },
+)
+def get_checkout_status(charge_id: int, request: Request):
+    """
+    Read-through Redis cache of the serialized charge (rewritten by the
+    workers and webhooks on every change). The ETag lets an unchanged poll
+    get a 304 without touching the database.
+    """
+    body = _load_charge_json(charge_id)
+    if body is None:
         raise HTTPException(status_code=404, detail="Charge not found")
-    
-    return charge
+
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest()[:20] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: a list of tags, W/ prefixes ignored, "*" matches."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+def _load_charge_json(charge_id: int) -> Optional[str]:
+    body = get_cached_charge(charge_id)
+    if body is not None:
+        return body
+
+    db = SessionLocal()
+    try:
+        charge = db.get(Charge, charge_id)
+        if not charge:
+            return None
+        body = serialize_charge(charge)
+    finally:
+        db.close()
+    cache_charge(charge_id, body)
+    return body
+
+@router.get("/checkout/{charge_id}/events")
+async def stream_checkout_status(charge_id: int, request: Request):
+    """
+    Server-Sent Events with the charge state: the current state first, then
+    every update published by the workers / Woovi webhook, until completion.
+    """
+    # Inscreve antes de ler o estado para não perder uma atualização no meio
+    pubsub = get_async_redis().pubsub()
+    await pubsub.subscribe(charge_channel(charge_id))
+
+    initial = await run_in_threadpool(_load_charge_json, charge_id)
+    if initial is None:
+        await pubsub.aclose()
+        raise HTTPException(status_code=404, detail="Charge not found")
+
+    return StreamingResponse(
+        _charge_events(request, pubsub, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _charge_events(request: Request, pubsub, initial: str) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + api_settings.checkout_sse_max_seconds
+    data = initial
+    try:
+        yield f"retry: 3000\nevent: charge\ndata: {data}\n\n"
+        while json.loads(data).get("status") != "completed" and loop.time() < deadline:
+            if await request.is_disconnected():
+                return
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=api_settings.checkout_sse_heartbeat
+            )
+            if message is None:
+                # Comentário SSE: mantém proxies e o navegador com a conexão aberta
+                yield ": ping\n\n"
+                continue
+            data = message["data"]
+            yield f"event: charge\ndata: {data}\n\n"
+    finally:
+        await pubsub.aclose()
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException
+from redis import RedisError
+
+from api.routes.webhooks import WEBHOOK_STATS_KEY
+from workers.services.provider_guard import provider_states
+from workers.services.redis_client import get_redis
+
+router = APIRouter()
+
+@router.get("/metrics/providers")
+def get_provider_metrics():
+    """Rate limiter and circuit breaker state of each external provider."""
+    try:
+        return provider_states()
+    except RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Redis unavailable: {e}")
+
+
+@router.get("/metrics/webhooks")
+def get_webhook_metrics():
+    """Formbricks deliveries buffered (unfinished) and suppressed as duplicates."""
+    try:
+        counters = get_redis().hgetall(WEBHOOK_STATS_KEY)
+    except RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Redis unavailable: {e}")
+    return {key: int(value) for key, value in counters.items()}
@@ -1,11 +1,18 @@
-import json
 from typing import Any
+
+import orjson
 from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from redis import RedisError
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from api.settings import api_settings
 
-from db.session import get_db
+from db.session import get_async_db, get_db
 from db.models import WebhookRequest, Charge, Lead
 from api.schemas import (
     WebhookPayload, 
@@ -15,7 +22,7 @@ from api.schemas import (
     BotLeadWebhookPayload
 )
 from sqlalchemy.exc import IntegrityError
-from workers.tasks import (
+from workers.queue import (
     process_webhook, 
     send_purchase_confirmation_whatsapp, 
     send_cal_booking_confirmation_whatsapp,
@@ -24,11 +31,66 @@ from workers.tasks import (
 )
 
 
-from api.utils import verify_formbricks_webhook
+from api.utils import extract_form_fields, verify_formbricks_webhook
+from workers.services.charge_events import publish_charge
+from workers.services.redis_client import get_async_redis
 
 
 router = APIRouter()
 
+# Contadores da ingestão do Formbricks (GET /api/metrics/webhooks)
+WEBHOOK_STATS_KEY = "webhooks:form:stats"
+
+# Colunas reescritas quando uma resposta ainda não concluída recebe um novo evento
+_UPDATABLE_COLUMNS = (
+    "payload", "status", "delivery_id",
+    "email", "phone", "instagram", "revenue_range", "finished", "survey_id",
+)
+
+
+def _parse_woovi_body(body: bytes) -> WooviWebhookPayload:
+    """Validates straight from the bytes; unwraps a double-encoded (JSON string) body."""
+    try:
+        return WooviWebhookPayload.model_validate_json(body)
+    except ValidationError:
+        # Se os dados vierem como uma string (double encoding), validamos o conteúdo dela
+        inner = orjson.loads(body)
+        if isinstance(inner, str):
+            return WooviWebhookPayload.model_validate_json(inner)
+        raise
+
+
+async def _count(counter: str) -> None:
+    try:
+        await get_async_redis().hincrby(WEBHOOK_STATS_KEY, counter, 1)
+    except RedisError as e:
+        print(f"WEBHOOK STATS ERROR: {e}")
+
+
+async def _store_form_response(db: AsyncSession, values: dict):
+    """
+    Inserts the response, or refreshes it while it is still buffered.
+    Returns (id, status) of the row written, or None when the delivery is a
+    duplicate (same webhook-id, or a response that was already queued).
+    """
+    stmt = insert(WebhookRequest).values(**values)
+    if values["response_id"]:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WebhookRequest.response_id],
+            set_={column: stmt.excluded[column] for column in _UPDATABLE_COLUMNS},
+            where=WebhookRequest.status == "buffered",
+        )
+    elif values["delivery_id"]:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[WebhookRequest.delivery_id])
+    try:
+        row = (await db.execute(stmt.returning(WebhookRequest.id, WebhookRequest.status))).first()
+        await db.commit()
+    except IntegrityError:
+        # webhook-id repetido apontando para outra resposta
+        await db.rollback()
+        return None
+    return row
+
 
 @router.get("/health")
 def health_check():
@@ -36,15 +98,14 @@ def health_check():
 
 
 @router.post("/webhooks/form", response_model=WebhookResponse)
-async def receive_webhook(request: Request, db: Session = Depends(get_db)):
+async def receive_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     body_bytes = await request.body()
-    body_str = body_bytes.decode("utf-8")
 
     # Verify Formbricks Signature
     if api_settings.formbricks_webhook_secret:
         try:
             verify_formbricks_webhook(
-                body_str, 
+                body_bytes.decode("utf-8"), 
                 dict(request.headers), 
                 api_settings.formbricks_webhook_secret
             )
@@ -53,14 +114,15 @@ async def receive_webhook(request: Request, db: Session = Depends(get_db)):
             raise HTTPException(status_code=401, detail=f"Invalid signature: {e}")
 
     try:
-        data = json.loads(body_str)
+        data = orjson.loads(body_bytes)
         # Handle both single object and list (doc shows list, but current code expects single)
         if isinstance(data, list) and len(data) > 0:
             payload_data = data[0]
         else:
             payload_data = data
             
-        payload = WebhookPayload(**payload_data)
+        # Um parse só: o dict validado é gravado como veio, sem model_dump
+        payload = WebhookPayload.model_validate(payload_data)
     except Exception as e:
         print(f"Error parsing Formbricks webhook payload: {e}")
         raise HTTPException(status_code=400, detail="Invalid payload")
@@ -68,19 +130,49 @@ async def receive_webhook(request: Request, db: Session = Depends(get_db)):
     if payload.event == "testEndpoint":
         return WebhookResponse(id=0, status="ok")
 
-    record = WebhookRequest(payload=payload.model_dump(mode="json"), status="queued")
-    db.add(record)
-    db.commit()
-    db.refresh(record)
+    fields = extract_form_fields(payload_data)
+    delivery_id = request.headers.get("webhook-id")
+    response_id = payload.data.id if payload.data else None
+    # Do modelo validado, não do dict: "true" ou 1 também contam como concluída
+    unfinished = payload.data is not None and payload.data.finished is False
+
+    # Só respostas incompletas ficam guardadas; o processamento começa quando a resposta termina
+    row = await _store_form_response(db, {
+        "payload": payload_data,
+        "status": "buffered" if unfinished else "queued",
+        "delivery_id": delivery_id,
+        "response_id": response_id,
+        **fields,
+        "finished": payload.data is not None and payload.data.finished,
+    })
 
-    process_webhook.send(record.id)
+    if row is None:
+        keys = []
+        if response_id:
+            keys.append(WebhookRequest.response_id == response_id)
+        if delivery_id:
+            keys.append(WebhookRequest.delivery_id == delivery_id)
+        existing = (await db.execute(
+            select(WebhookRequest.id, WebhookRequest.status).where(or_(*keys)).limit(1)
+        )).first()
+        await _count("duplicates")
+        print(f"WEBHOOK: entrega duplicada ignorada (webhook-id {delivery_id}, resposta {response_id})")
+        if existing is None:
+            raise HTTPException(status_code=409, detail="Duplicate delivery")
+        return WebhookResponse(id=existing.id, status=existing.status)
 
-    return WebhookResponse(id=record.id, status=record.status)
+    if row.status == "buffered":
+        await _count("buffered")
+    else:
+        # O enqueue é um comando Redis síncrono: fora do event loop
+        await run_in_threadpool(process_webhook.send, row.id)
+
+    return WebhookResponse(id=row.id, status=row.status)
 
 
 
 @router.post("/webhooks/woovi")
-async def woovi_webhook(request: Request, db: Session = Depends(get_db)):
+async def woovi_webhook(request: Request, db: AsyncSession = Depends(get_async_db)):
     # Validação do Token de Segurança
     if api_settings.woovi_webhook_token:
         auth_header = request.headers.get("Authorization")
@@ -88,19 +180,12 @@ async def woovi_webhook(request: Request, db: Session = Depends(get_db)):
             print(f"Tentativa de webhook não autorizada. Header: {auth_header}")
             raise HTTPException(status_code=401, detail="Unauthorized")
 
-    body = await request.body()
     try:
-        data = json.loads(body)
-        # Se os dados vierem como uma string (double encoding), fazemos o load novamente
-        if isinstance(data, str):
-            data = json.loads(data)
-    except Exception as e:
+        payload = _parse_woovi_body(await request.body())
+    except orjson.JSONDecodeError as e:
         print(f"Erro ao parsear JSON da Woovi: {e}")
         return {"status": "error", "message": "invalid json"}
-
-    try:
-        payload = WooviWebhookPayload(**data)
-    except Exception as e:
+    except ValidationError as e:
         print(f"Erro de validação do webhook Woovi: {e}")
         return {"status": "error", "message": "invalid payload structure"}
 
@@ -109,20 +194,28 @@ async def woovi_webhook(request: Request, db: Session = Depends(get_db)):
 
     if payload.event == "OPENPIX:CHARGE_COMPLETED" and payload.charge:
         print(payload)
-        # Find the charge by correlationID
         correlation_id = payload.charge.correlationID
-        charge = db.query(Charge).filter(Charge.correlation_id == correlation_id).first()
+        # Transição atômica: só a primeira entrega muda a linha e dispara as ações pós-compra
+        charge = (await db.execute(
+            update(Charge)
+            .where(Charge.correlation_id == correlation_id, Charge.status != "completed")
+            .values(status="completed")
+            .returning(Charge)
+        )).scalar_one_or_none()
+        await db.commit()
 
-        if charge:
-            charge.status = "completed"
-            db.commit()
-            print(f"Iniciando outra ação pos compra para {charge.correlation_id}")
-            
-            # Envia mensagem no WhatsApp via BotConversa
-            send_purchase_confirmation_whatsapp.send(charge.id)
-            
-            # Registra no Ploomes
-            track_purchase_ploomes_task.send(charge.id)
+        if charge is None:
+            print(f"Woovi: cobrança {correlation_id} já concluída ou inexistente, nada a fazer")
+            return {"status": "ok", "message": "no change"}
+
+        await run_in_threadpool(publish_charge, charge)
+        print(f"Iniciando outra ação pos compra para {charge.correlation_id}")
+        
+        # Envia mensagem no WhatsApp via BotConversa
+        await run_in_threadpool(send_purchase_confirmation_whatsapp.send, charge.id)
+        
+        # Registra no Ploomes
+        await run_in_threadpool(track_purchase_ploomes_task.send, charge.id)
             
     return {"status": "ok"}
 
@@ -142,13 +235,15 @@ async def cal_webhook(payload: CalWebhookPayload):
             
             if customer.phoneNumber:
                 # 1) WhatsApp
-                send_cal_booking_confirmation_whatsapp.send(
+                await run_in_threadpool(
+                    send_cal_booking_confirmation_whatsapp.send,
                     phone=customer.phoneNumber,
                     name=customer.name
                 )
                 
                 # 2) Ploomes Tracking
-                track_booking_ploomes_task.send(
+                await run_in_threadpool(
+                    track_booking_ploomes_task.send,
                     name=customer.name,
                     email=customer.email,
                     phone=customer.phoneNumber,
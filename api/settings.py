@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
 
@@ -28,12 +28,48 @@ class ApiSettings(BaseSettings):
     # Dramatiq
     dramatiq_broker_url: str = Field(alias="DRAMATIQ_BROKER_URL")
 
+    # Redis for caches and counters (empty = same server as the broker)
+    redis_url: str | None = Field(default=None, alias="REDIS_URL")
+
     # Database
     database_url: str = Field(alias="DATABASE_URL")
+    # asyncpg URL for the async routes (empty = DATABASE_URL with the asyncpg driver)
+    database_async_url: str | None = Field(default=None, alias="DATABASE_ASYNC_URL")
+    # Connection pool per engine and process (sync and async engines have one each)
+    db_pool_size: int = Field(5, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(10, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(30.0, alias="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(1800, alias="DB_POOL_RECYCLE")
 
     # OpenAI
     openai_api_key: str = Field(alias="OPENAI_API_KEY")
     openai_model: str = Field("gpt-4.1-mini", alias="OPENAI_MODEL")
+    # "fields" = model returns placeholder values as JSON; "html" = model returns the full HTML;
+    # "sections" = one concurrent request per audit section (workers/services/audit_sections.py)
+    openai_generation_mode: str = Field("fields", alias="OPENAI_GENERATION_MODE")
+    # Per-section model / token limit, e.g. {"estrategia": {"model": "gpt-4.1", "max_output_tokens": 3000}}
+    openai_section_overrides: Dict[str, Dict[str, Any]] = Field(
+        default_factory=dict, alias="OPENAI_SECTION_OVERRIDES"
+    )
+    # "thread" = LLM call blocks the Dramatiq thread; "async" = per-process asyncio LLM stage
+    llm_stage_mode: str = Field("thread", alias="LLM_STAGE_MODE")
+    # Seconds after which a row left in "generating" (worker killed mid-call) is picked up again
+    llm_stage_stale_after: int = Field(900, alias="LLM_STAGE_STALE_AFTER")
+    # Concurrent OpenAI requests per worker process on the LLM stage (a sections job makes several)
+    openai_max_in_flight: int = Field(200, alias="OPENAI_MAX_IN_FLIGHT")
+
+    # PDF
+    # "measure" lays out once and reads the content height; "search" keeps the binary search
+    pdf_height_strategy: str = Field("measure", alias="PDF_HEIGHT_STRATEGY")
+    # Render processes per worker (empty = CPU count, 0 = render in the actor thread)
+    pdf_render_processes: int | None = Field(default=None, alias="PDF_RENDER_PROCESSES")
+    pdf_render_max_jobs: int = Field(50, alias="PDF_RENDER_MAX_JOBS")
+    pdf_render_max_rss_mb: int = Field(1024, alias="PDF_RENDER_MAX_RSS_MB")
+    pdf_render_timeout: float = Field(300, alias="PDF_RENDER_TIMEOUT")
+    # Optional local copy of generated PDFs (disabled when empty)
+    pdf_local_copy_dir: str | None = Field(default=None, alias="PDF_LOCAL_COPY_DIR")
+    pdf_local_copy_max_mb: int = Field(500, alias="PDF_LOCAL_COPY_MAX_MB")
+    pdf_local_copy_max_age_hours: int = Field(72, alias="PDF_LOCAL_COPY_MAX_AGE_HOURS")
 
     # Google Drive
     google_service_account_json_base64: str | None = Field(
@@ -42,16 +78,54 @@ class ApiSettings(BaseSettings):
     google_drive_folder_id: str = Field(alias="GOOGLE_DRIVE_FOLDER_ID")
     google_drive_csv_folder_id: str = Field(alias="GOOGLE_DRIVE_CSV_FOLDER_ID")
 
+    # Outbound HTTP (Woovi, BotConversa, Ploomes) - workers/services/http.py
+    http_connect_timeout: float = Field(5, alias="HTTP_CONNECT_TIMEOUT")
+    http_read_timeout: float = Field(10, alias="HTTP_READ_TIMEOUT")
+    http_max_retries: int = Field(2, alias="HTTP_MAX_RETRIES")
+    http_retry_backoff: float = Field(0.5, alias="HTTP_RETRY_BACKOFF")
+    http_max_connections: int = Field(20, alias="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(10, alias="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    http_http2: bool = Field(True, alias="HTTP_HTTP2")
+    # Shared token bucket per provider (requests/s and burst) - workers/services/provider_guard.py
+    provider_rate_limits: Dict[str, Dict[str, float]] = Field(
+        default_factory=lambda: {
+            "woovi": {"rate": 10, "burst": 20},
+            "botconversa": {"rate": 5, "burst": 10},
+            "ploomes": {"rate": 2, "burst": 5},
+        },
+        alias="PROVIDER_RATE_LIMITS",
+    )
+    # Max seconds a call waits for a token before the message is deferred
+    provider_max_wait: float = Field(5, alias="PROVIDER_MAX_WAIT")
+    # Circuit breaker: N failures within WINDOW seconds open it for COOLDOWN seconds
+    provider_circuit_failures: int = Field(5, alias="PROVIDER_CIRCUIT_FAILURES")
+    provider_circuit_window: int = Field(60, alias="PROVIDER_CIRCUIT_WINDOW")
+    provider_circuit_cooldown: int = Field(30, alias="PROVIDER_CIRCUIT_COOLDOWN")
+
     # Woovi
     woovi_app_id: str | None = Field(default=None, alias="WOOVI_APP_ID")
     woovi_env: str = Field("production", alias="WOOVI_ENV")
     woovi_webhook_token: str | None = Field(default=None, alias="WOOVI_WEBHOOK_TOKEN")
+    # POST /api/checkout creates the PIX inline (up to the timeout) before falling back to the queue
+    checkout_fast_pix: bool = Field(True, alias="CHECKOUT_FAST_PIX")
+    checkout_fast_pix_timeout: float = Field(3.0, alias="CHECKOUT_FAST_PIX_TIMEOUT")
+    # TTL (seconds) of the cached GET /api/checkout/{id} response; 0 disables the cache
+    checkout_cache_ttl: int = Field(300, alias="CHECKOUT_CACHE_TTL")
+    # GET /api/checkout/{id}/events: heartbeat interval and max stream duration (browser reconnects)
+    checkout_sse_heartbeat: float = Field(15, alias="CHECKOUT_SSE_HEARTBEAT")
+    checkout_sse_max_seconds: float = Field(600, alias="CHECKOUT_SSE_MAX_SECONDS")
 
     # BotConversa
     botconversa_api_key: str | None = Field(default=None, alias="BOTCONVERSA_API_KEY")
+    # phone -> subscriber_id cache TTL (seconds)
+    botconversa_subscriber_cache_ttl: int = Field(30 * 24 * 3600, alias="BOTCONVERSA_SUBSCRIBER_CACHE_TTL")
 
     # Ploomes
     ploomes_user_key: str | None = Field(default=None, alias="PLOOMES_USER_KEY")
+    # Lookup cache TTLs (seconds); negative = email not found in Ploomes
+    ploomes_users_cache_ttl: int = Field(6 * 3600, alias="PLOOMES_USERS_CACHE_TTL")
+    ploomes_contact_cache_ttl: int = Field(7 * 24 * 3600, alias="PLOOMES_CONTACT_CACHE_TTL")
+    ploomes_negative_cache_ttl: int = Field(300, alias="PLOOMES_NEGATIVE_CACHE_TTL")
     formbricks_webhook_secret: Optional[str] = Field(default=None, alias="FORMBRICKS_WEBHOOK_SECRET")
     formbricks_survey_url: str = Field(
         default="https://forms.spreed-automacao.com.br/s/cmkzs8mm80000rn014bepotpk", 
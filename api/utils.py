@@ -1,8 +1,9 @@
 import base64
 import hashlib
 import hmac
+import re
 import time
-from typing import Dict
+from typing import Any, Dict, Optional
 
 
 def decode_secret(secret: str) -> bytes:
@@ -79,3 +80,51 @@ def verify_formbricks_webhook(body: str, headers: Dict[str, str], secret: str) -
         raise ValueError("Invalid signature")
 
     return True
+
+
+def normalize_phone(phone: str) -> str:
+    """Digits only, with the 55 (Brasil) prefix when the number has only DDD + number."""
+    clean_phone = re.sub(r'\D', '', str(phone))
+    
+    # Se o número tiver 10 ou 11 dígitos (DD + número), adicionamos o 55 (Brasil)
+    if len(clean_phone) in [10, 11] and not clean_phone.startswith('55'):
+        clean_phone = '55' + clean_phone
+    return clean_phone
+
+
+# Perguntas do formulário que podem trazer o telefone
+PHONE_FIELDS = ("phone", "telefone", "whatsapp")
+
+
+def _text(value: Any, max_length: int = 255) -> Optional[str]:
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    value = str(value).strip()[:max_length]
+    return value or None
+
+
+def extract_form_fields(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Canonical answers of a Formbricks payload, stored in their own
+    WebhookRequest columns at ingest (same rules as the backfill migration 9e4f1a2b6c73).
+    `finished` is not read here: the route takes it from the validated WebhookData.
+    """
+    data = payload.get("data") or {}
+    answers = data.get("data") or {}
+
+    instagram = _text(answers.get("instagram"))
+    if instagram:
+        instagram = instagram.lstrip("@").strip() or None
+
+    phone = next((_text(answers.get(field)) for field in PHONE_FIELDS if _text(answers.get(field))), None)
+    if phone:
+        phone = normalize_phone(phone)
+        phone = phone if 0 < len(phone) <= 20 else None
+
+    return {
+        "email": _text(answers.get("email")),
+        "phone": phone,
+        "instagram": instagram,
+        "revenue_range": _text(answers.get("faturamento_medio_atual")),
+        "survey_id": _text(data.get("surveyId"), max_length=64),
+    }
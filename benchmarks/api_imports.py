@@ -0,0 +1,82 @@
+"""
+Startup check for the API import graph: imports api.main in a fresh
+interpreter and reports import time, peak RSS and whether any worker-only
+dependency was loaded. Exits with status 1 if WeasyPrint, OpenAI, the Google
+API client or the actor implementations (workers.tasks) are imported, or if
+a --max-* limit is exceeded, so it can run in CI.
+
+    uv run python -m benchmarks.api_imports
+    uv run python -m benchmarks.api_imports --compare --max-rss-mb 150
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+
+# Só o processo do worker precisa destes módulos
+FORBIDDEN_MODULES = ("weasyprint", "openai", "googleapiclient", "workers.tasks")
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": rss_kb / 1024 if sys.platform != "darwin" else rss_kb / 1024 / 1024,
+    "modules": len(sys.modules),
+    "loaded": [m for m in {forbidden!r} if m in sys.modules],
+}}))
+"""
+
+
+def probe(module: str) -> dict:
+    """Imports `module` in a new interpreter and returns its measurements."""
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, forbidden=FORBIDDEN_MODULES)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"falha ao importar {module}:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _report(name: str, stats: dict) -> None:
+    print(
+        f"{name:<14} {stats['seconds'] * 1000:7.0f}ms  pico RSS {stats['rss_mb']:6.1f}MB  "
+        f"{stats['modules']} módulos  pesados: {', '.join(stats['loaded']) or 'nenhum'}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compare", action="store_true", help="also measure importing workers.tasks")
+    parser.add_argument("--max-rss-mb", type=float, default=None)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    api = probe("api.main")
+    _report("api.main", api)
+    if args.compare:
+        _report("workers.tasks", probe("workers.tasks"))
+
+    failures = []
+    if api["loaded"]:
+        failures.append(f"a API importou dependências do worker: {', '.join(api['loaded'])}")
+    if args.max_rss_mb is not None and api["rss_mb"] > args.max_rss_mb:
+        failures.append(f"pico RSS {api['rss_mb']:.1f}MB > {args.max_rss_mb}MB")
+    if args.max_seconds is not None and api["seconds"] > args.max_seconds:
+        failures.append(f"import em {api['seconds']:.2f}s > {args.max_seconds}s")
+
+    for failure in failures:
+        print(f"FALHOU: {failure}")
+    if failures:
+        raise SystemExit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
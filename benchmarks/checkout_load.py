@@ -0,0 +1,74 @@
+"""
+Load test for GET /api/checkout/{id}: sustained requests per second and
+latency with N concurrent pollers against a running API.
+
+Compare the API started with CHECKOUT_CACHE_TTL=0 (every poll reads
+Postgres) and with the Redis cache enabled; --etag sends If-None-Match like
+a browser revalidating, so unchanged polls are answered with 304.
+
+    uv run python -m benchmarks.checkout_load --url http://localhost:8000/api/checkout/1 --concurrency 50 --duration 15
+    uv run python -m benchmarks.checkout_load --url http://localhost:8000/api/checkout/1 --etag
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from typing import List
+
+import httpx
+
+
+async def _poller(client: httpx.AsyncClient, url: str, deadline: float, etag: bool,
+                  latencies: List[float], statuses: Counter) -> None:
+    current_etag = None
+    while time.perf_counter() < deadline:
+        headers = {"If-None-Match": current_etag} if etag and current_etag else {}
+        start = time.perf_counter()
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] += 1
+        current_etag = response.headers.get("etag", current_etag)
+
+
+async def run(url: str, concurrency: int, duration: float, etag: bool) -> None:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        # Aquecimento: preenche o cache e abre as conexões
+        await asyncio.gather(*(client.get(url) for _ in range(concurrency)))
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(
+            _poller(client, url, deadline, etag, latencies, statuses) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    if not latencies:
+        print(f"nenhuma resposta: {dict(statuses)}")
+        return
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    print(
+        f"{len(latencies)} requests em {elapsed:.1f}s -> {len(latencies) / elapsed:.0f} req/s | "
+        f"p50 {statistics.median(latencies):.1f}ms p95 {p95:.1f}ms | status {dict(statuses)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="e.g. http://localhost:8000/api/checkout/1")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15, help="seconds")
+    parser.add_argument("--etag", action="store_true", help="send If-None-Match (304 on unchanged polls)")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.concurrency, args.duration, args.etag))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Time-to-QR of POST /api/checkout: from the request to the moment the
+client sees br_code, with the queued actor (CHECKOUT_FAST_PIX off, the
+previous flow) and with the fast path that calls Woovi in the request.
+
+Runs the API in-process (TestClient) and a Dramatiq worker thread against
+the local Postgres and Redis from .env, with Woovi replaced by a local
+stub that answers after --latency seconds. The client polls
+GET /api/checkout/{id} every --poll seconds until br_code appears.
+
+    uv run python -m benchmarks.checkout_time_to_qr --checkouts 20 --latency 0.3
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import threading
+import time
+import uuid
+from typing import List
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+CUSTOMER = {"name": "Natan Spreed", "email": "natan@spreed.ai", "cpf": "12345678909", "whatsapp": "5511999999999"}
+
+
+def _stub_app(latency: float) -> Starlette:
+    def charge(correlation_id: str) -> dict:
+        return {
+            "correlationID": correlation_id,
+            "brCode": f"00020101021226880014br.gov.bcb.pix{uuid.uuid4().hex}",
+            "qrCodeImage": f"https://stub.local/qr/{correlation_id}.png",
+            "paymentLinkUrl": f"https://stub.local/pay/{correlation_id}",
+            "expiresDate": "2030-01-01T00:00:00.000Z",
+        }
+
+    async def create(request: Request) -> JSONResponse:
+        payload = await request.json()
+        await asyncio.sleep(latency)
+        return JSONResponse({"charge": charge(payload["correlationID"])})
+
+    async def get(request: Request) -> JSONResponse:
+        await asyncio.sleep(latency)
+        return JSONResponse({"charge": charge(request.path_params["correlation_id"])})
+
+    return Starlette(routes=[
+        Route("/api/v1/charge", create, methods=["POST"]),
+        Route("/api/v1/charge/{correlation_id}", get, methods=["GET"]),
+    ])
+
+
+def _start_stub(latency: float) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    config = uvicorn.Config(_stub_app(latency), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/api/v1"
+
+
+def _time_to_qr(client, poll: float) -> float:
+    start = time.perf_counter()
+    response = client.post("/api/checkout", json=CUSTOMER)
+    response.raise_for_status()
+    charge = response.json()
+    while not charge.get("br_code"):
+        time.sleep(poll)
+        charge = client.get(f"/api/checkout/{charge['id']}").json()
+    return (time.perf_counter() - start) * 1000
+
+
+def _summary(label: str, timings: List[float]) -> str:
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    return (
+        f"{label:>18}: p50 {statistics.median(timings):7.0f} ms | "
+        f"p95 {p95:7.0f} ms | max {timings[-1]:7.0f} ms ({len(timings)} checkouts)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkouts", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub Woovi latency per request (s)")
+    parser.add_argument("--poll", type=float, default=0.05, help="client poll interval (s)")
+    args = parser.parse_args()
+
+    from dramatiq import Worker
+    from fastapi.testclient import TestClient
+
+    import workers.services.woovi as woovi
+    import workers.tasks  # noqa: F401  (declara os actors no broker)
+    from api.main import app
+    from api.settings import api_settings
+    from workers.queue import broker
+
+    api_settings.woovi_app_id = "benchmark"
+    api_settings.woovi_env = "production"
+    woovi.WOOVI_PROD_URL = _start_stub(args.latency)
+
+    worker = Worker(broker, worker_threads=4)
+    worker.start()
+    try:
+        with TestClient(app) as client:
+            for label, fast_pix in (("fila (antes)", False), ("fast path (depois)", True)):
+                api_settings.checkout_fast_pix = fast_pix
+                _time_to_qr(client, args.poll)  # aquecimento
+                timings = [_time_to_qr(client, args.poll) for _ in range(args.checkouts)]
+                print(_summary(label, timings))
+    finally:
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
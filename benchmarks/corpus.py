@@ -0,0 +1,76 @@
+"""
+Synthetic, filled-in auditoria_template.html documents used by the render
+benchmarks. The content mimics what the LLM returns (rich <p>/<ul> blocks).
+"""
+from typing import Dict
+
+from workers.services.audit_template import AUDIT_TEMPLATE
+
+
+PARAGRAPH = (
+    "O perfil já tem sinais claros de <strong>Alavancagem de Autoridade</strong>, "
+    "mas a distribuição de conteúdo ainda não conversa com o Público Qualificado. "
+    "Existem Lacunas de Conversão entre o alcance dos Reels e a oferta principal, "
+    "o que limita a Escalabilidade Digital do negócio nos próximos meses."
+)
+
+
+def _rich_block(paragraphs: int, bullets: int) -> str:
+    parts = [f"<p>{PARAGRAPH}</p>" for _ in range(paragraphs)]
+    if bullets:
+        items = "".join(
+            f"<li><strong>Ação {i + 1}:</strong> {PARAGRAPH[:140]}</li>" for i in range(bullets)
+        )
+        parts.append(f"<ul>{items}</ul>")
+    return "\n".join(parts)
+
+
+def sample_fields(scale: int = 1) -> Dict[str, str]:
+    """Placeholder values for the template; `scale` multiplies the long sections."""
+    return {
+        "nome_completo": "Natan Spreed",
+        "instagram": "natanspreed",
+        "nicho_principal": "Infoprodutor / Educação Online",
+        "resumo_executivo": PARAGRAPH,
+        "ticket_medio": "R$ 5.000,00",
+        "leads_estimados": "40–60",
+        "faturamento_potencial": "R$ 150.000,00",
+        "tamanho_mercado_html": _rich_block(2 * scale, 3),
+        "audiencia_html": _rich_block(2 * scale, 2),
+        "diagnostico_html": _rich_block(3 * scale, 4 * scale),
+        "erros_html": _rich_block(1, 3 * scale),
+        "meta_seguidores": "50k",
+        "leads_atuais": "10",
+        "meta_leads": "60",
+        "meta_faturamento": "R$ 100.000,00",
+        "oportunidade_html": _rich_block(2 * scale, 2),
+        "plano_detalhado_html": _rich_block(2 * scale, 6 * scale),
+        "conclusao_html": _rich_block(4 * scale, 0),
+    }
+
+
+def fill_template(fields: Dict[str, str]) -> str:
+    return AUDIT_TEMPLATE.render(fields)
+
+
+# Nome do documento -> multiplicador das seções longas
+CORPUS_SCALES = {
+    "curto": 1,
+    "medio": 3,
+    "longo": 8,
+    "muito_longo": 20,
+}
+
+
+def build_corpus() -> Dict[str, str]:
+    """Realistic filled-in audits, from a typical short one to a very long one."""
+    return {name: fill_template(sample_fields(scale)) for name, scale in CORPUS_SCALES.items()}
+
+
+# Escalas cujo conteúdo cabe na página máxima (5000mm): exercitam a medição da altura
+HEIGHT_CHECK_SCALES = range(1, 8)
+
+
+def build_height_corpus() -> Dict[str, str]:
+    """Audits from the shortest to the tallest that still fits one page."""
+    return {f"escala_{scale}": fill_template(sample_fields(scale)) for scale in HEIGHT_CHECK_SCALES}
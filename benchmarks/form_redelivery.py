@@ -0,0 +1,130 @@
+"""
+Duplicate and out-of-order Formbricks deliveries: checks that a buffered
+(unfinished) response is queued exactly once when its completion arrives,
+however many times that completion is redelivered, and with `finished`
+sent as true, "true" or 1 (one form per round, in turn).
+
+Each round posts two unfinished deliveries for a new response id (the row
+must stay "buffered" and nothing is enqueued), then --concurrency finished
+deliveries at once, half of them repeating the same webhook-id. The row must
+end "queued" with exactly one process_webhook enqueue. A delivery with
+`data: null` must be queued too, never buffered.
+
+Runs the API in-process (TestClient) against the local Postgres from .env.
+process_webhook.send is replaced by a counter, so nothing reaches Redis or
+the worker; the rows written are deleted at the end.
+
+    uv run python -m benchmarks.form_redelivery --concurrency 20 --rounds 5
+"""
+import argparse
+import json
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, List
+
+from sqlalchemy import create_engine, delete, select
+
+from benchmarks.webhook_parsing import formbricks_body
+
+
+# Formas de "concluída" que o WebhookData aceita (modo lax do Pydantic)
+FINISHED_FORMS = (True, "true", 1)
+
+
+class _CountingActor:
+    """Stands in for the process_webhook ActorRef: records the ids it would enqueue."""
+
+    def __init__(self) -> None:
+        self.sent: Counter = Counter()
+        self._lock = Lock()
+
+    def send(self, webhook_id: int) -> None:
+        with self._lock:
+            self.sent[webhook_id] += 1
+
+
+def _delivery(response_id: str, finished: Any) -> Dict[str, Any]:
+    payload = json.loads(formbricks_body())
+    payload["event"] = "responseFinished" if finished else "responseUpdated"
+    payload["data"]["id"] = response_id
+    payload["data"]["finished"] = finished
+    return payload
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20, help="finished deliveries per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    import api.routes.webhooks as webhooks
+    from api.main import app
+    from api.settings import api_settings
+    from db.models import WebhookRequest
+
+    api_settings.formbricks_webhook_secret = None
+    actor = _CountingActor()
+    webhooks.process_webhook = actor
+    engine = create_engine(api_settings.database_url)
+    written: List[int] = []
+    ok = True
+
+    with TestClient(app) as client:
+        def post(payload: dict, delivery_id: str) -> dict:
+            response = client.post("/api/webhooks/form", json=payload, headers={"webhook-id": delivery_id})
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            for round_number in range(1, args.rounds + 1):
+                response_id = f"bench-{uuid.uuid4()}"
+                buffered = [post(_delivery(response_id, False), f"msg-{uuid.uuid4()}") for _ in range(2)]
+                row_id = buffered[0]["id"]
+                written.append(row_id)
+
+                repeated = f"msg-{uuid.uuid4()}"
+                finished = FINISHED_FORMS[(round_number - 1) % len(FINISHED_FORMS)]
+                deliveries = [
+                    (_delivery(response_id, finished), repeated if i % 2 else f"msg-{uuid.uuid4()}")
+                    for i in range(args.concurrency)
+                ]
+                with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                    outcomes = list(pool.map(lambda d: post(*d), deliveries))
+
+                with engine.connect() as conn:
+                    status = conn.execute(
+                        select(WebhookRequest.status).where(WebhookRequest.id == row_id)
+                    ).scalar_one()
+                round_ok = (
+                    [b["status"] for b in buffered] == ["buffered", "buffered"]
+                    and all(o["id"] == row_id for o in outcomes)
+                    and status == "queued"
+                    and actor.sent[row_id] == 1
+                )
+                ok = ok and round_ok
+                print(
+                    f"rodada {round_number} (finished={finished!r}): {[b['status'] for b in buffered]} -> "
+                    f"{dict(Counter(o['status'] for o in outcomes))}, linha {status}, "
+                    f"{actor.sent[row_id]} enqueue(s) -> {'ok' if round_ok else 'FALHOU'}"
+                )
+
+            empty = post({"event": "responseCreated", "data": None}, f"msg-{uuid.uuid4()}")
+            written.append(empty["id"])
+            empty_ok = empty["status"] == "queued" and actor.sent[empty["id"]] == 1
+            ok = ok and empty_ok
+            print(f"data null: {empty['status']}, {actor.sent[empty['id']]} enqueue(s) -> "
+                  f"{'ok' if empty_ok else 'FALHOU'}")
+        finally:
+            with engine.begin() as conn:
+                conn.execute(delete(WebhookRequest).where(WebhookRequest.id.in_(written)))
+
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
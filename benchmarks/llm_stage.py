@@ -0,0 +1,108 @@
+"""
+Throughput of the LLM stage: thread-per-job (current Dramatiq model) vs the
+asyncio stage (workers/services/llm_stage.py), against a local stub of the
+OpenAI Responses API that answers after a fixed latency.
+
+    uv run python -m benchmarks.llm_stage --jobs 200 --latency 1 --threads 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from benchmarks.corpus import sample_fields
+
+
+TEST_PAYLOAD = {"data": {"data": {"name": "Natan Spreed", "instagram": "@natanspreed"}}}
+
+
+def _stub_app(latency: float) -> Starlette:
+    output = json.dumps(sample_fields())
+
+    async def responses(request: Request) -> JSONResponse:
+        await request.body()
+        await asyncio.sleep(latency)
+        return JSONResponse({
+            "id": "resp_stub",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": "stub",
+            "status": "completed",
+            "output": [{
+                "id": "msg_stub",
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": output, "annotations": []}],
+            }],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+        })
+
+    return Starlette(routes=[Route("/v1/responses", responses, methods=["POST"])])
+
+
+def _start_stub(latency: float) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    config = uvicorn.Config(_stub_app(latency), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def bench_threads(jobs: int, threads: int) -> float:
+    from workers.services.openai_client import generate_html
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        wait([executor.submit(generate_html, TEST_PAYLOAD) for _ in range(jobs)])
+    return time.perf_counter() - start
+
+
+def bench_async(jobs: int, max_in_flight: int) -> float:
+    from workers.services.llm_stage import LLMStage
+
+    stage = LLMStage(max_in_flight=max_in_flight)
+    start = time.perf_counter()
+    futures = [stage.generate_html(TEST_PAYLOAD) for _ in range(jobs)]
+    for future in futures:
+        future.result()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=1.0, help="stub latency per call (s)")
+    parser.add_argument("--threads", type=int, default=8, help="Dramatiq threads per process")
+    parser.add_argument("--max-in-flight", type=int, default=200)
+    args = parser.parse_args()
+
+    # Os clientes OpenAI leem OPENAI_BASE_URL do ambiente
+    os.environ["OPENAI_BASE_URL"] = _start_stub(args.latency)
+
+    for label, elapsed in (
+        (f"threads ({args.threads})", bench_threads(args.jobs, args.threads)),
+        (f"asyncio (até {args.max_in_flight})", bench_async(args.jobs, args.max_in_flight)),
+    ):
+        print(f"{label:>22}: {args.jobs} gerações em {elapsed:6.2f}s -> {args.jobs / elapsed:7.1f} jobs/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Query plans of the worker lookups with and without the lookup indexes
+(migrations 3c9d2e71b8a4 and 9e4f1a2b6c73) on a seeded copy of the tables.
+
+Creates the schema `bench_lookup` in the DATABASE_URL database, seeds --rows
+charges, webhook_requests and leads, prints EXPLAIN ANALYZE for each lookup
+without the indexes, creates them and prints the plans again. The schema is
+dropped at the end (unless --keep); the application tables are not touched.
+Exits 1 if a lookup's plan does not use its index once the indexes exist.
+
+    uv run python -m benchmarks.lookup_indexes --rows 1000000
+"""
+import argparse
+import re
+import time
+
+from sqlalchemy import create_engine, or_, select, text
+from sqlalchemy.dialects import postgresql
+
+from api.settings import api_settings
+from db.models import Base, Charge, Lead, WebhookRequest
+
+
+SCHEMA = "bench_lookup"
+
+SEED_SQL = (
+    # Cada email/telefone aparece em duas cobranças
+    """
+    INSERT INTO charges (correlation_id, status, value, customer_name, customer_email,
+                         customer_tax_id, customer_phone, created_at, updated_at)
+    SELECT 'bench-' || g, 'completed', 4990, 'Cliente ' || g,
+           'user' || (g % (:rows / 2)) || '@example.com', '00000000000',
+           '5511' || lpad((g % (:rows / 2))::text, 9, '0'),
+           now() - g * interval '1 second', now()
+    FROM generate_series(1, :rows) AS g
+    """,
+    """
+    INSERT INTO webhook_requests (payload, status, email, revenue_range, finished, created_at,
+                                  start_message_sent)
+    SELECT jsonb_build_object(
+               'event', 'responseFinished',
+               'data', jsonb_build_object(
+                   'id', 'resp-' || g,
+                   'finished', true,
+                   'data', jsonb_build_object(
+                       'email', 'user' || g || '@example.com',
+                       'faturamento_medio_atual', 'R$ 25-50 mil'
+                   )
+               )
+           ),
+           'done', 'user' || g || '@example.com', 'R$ 25-50 mil', true,
+           now() - g * interval '1 second', false
+    FROM generate_series(1, :rows) AS g
+    """,
+    # Os não convertidos são apagados a cada exportação: sobra ~1% na tabela
+    """
+    INSERT INTO leads (name, phone, has_purchased, has_booked, created_at, updated_at)
+    SELECT 'Lead ' || g, '5521' || lpad(g::text, 9, '0'), g % 100 <> 0, g % 3 = 0,
+           now() - g * interval '1 second', now()
+    FROM generate_series(1, :rows) AS g
+    """,
+)
+
+
+# Lookup -> índices que o plano com os índices precisa usar
+EXPECTED_INDEXES = {
+    "process_webhook: última cobrança do email": ("ix_charges_customer_email_created_at",),
+    "track_booking: cobrança por email ou telefone": (
+        "ix_charges_customer_email_created_at", "ix_charges_customer_phone_created_at",
+    ),
+    "track_booking: faturamento do formulário": ("ix_webhook_requests_email_created_at",),
+    "send_*: lead pelo telefone": ("leads_phone_key",),
+    "export_leads: não convertidos": ("ix_leads_not_converted",),
+}
+
+
+def _lookups(rows: int) -> dict:
+    n = rows // 4
+    email, phone = f"user{n}@example.com", f"5511{n:09d}"
+    return {
+        "process_webhook: última cobrança do email": select(Charge)
+        .where(Charge.customer_email == email)
+        .order_by(Charge.created_at.desc()).limit(1),
+        "track_booking: cobrança por email ou telefone": select(Charge)
+        .where(or_(Charge.customer_email == email, Charge.customer_phone == phone))
+        .order_by(Charge.created_at.desc()).limit(1),
+        "track_booking: faturamento do formulário": select(WebhookRequest.revenue_range)
+        .where(WebhookRequest.email == email)
+        .order_by(WebhookRequest.created_at.desc()).limit(1),
+        "send_*: lead pelo telefone": select(Lead)
+        .where(Lead.phone == f"5521{n:09d}").limit(1),
+        "export_leads: não convertidos": select(Lead)
+        .where(Lead.has_purchased == False, Lead.has_booked == False),  # noqa: E712
+    }
+
+
+def _explain(conn, rows: int) -> tuple:
+    timings, plans = {}, {}
+    dialect = postgresql.psycopg2.dialect()
+    for name, query in _lookups(rows).items():
+        sql = str(query.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        plan = [r[0] for r in conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"))]
+        execution = next((float(m.group(1)) for line in plan
+                          if (m := re.search(r"Execution Time: ([\d.]+) ms", line))), 0.0)
+        timings[name] = execution
+        plans[name] = "\n".join(plan)
+        print(f"\n-- {name}")
+        print(plans[name])
+    return timings, plans
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows per table")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    engine = create_engine(api_settings.database_url)
+    indexes = [index for table in Base.metadata.sorted_tables for index in table.indexes]
+
+    with engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        Base.metadata.create_all(conn)
+        for index in indexes:
+            index.drop(conn)
+
+        start = time.perf_counter()
+        for sql in SEED_SQL:
+            conn.execute(text(sql), {"rows": args.rows})
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+        print(f"seed: {args.rows} linhas por tabela em {time.perf_counter() - start:.1f}s")
+
+        print("\n==== sem os índices ====")
+        before, _ = _explain(conn, args.rows)
+
+        start = time.perf_counter()
+        for index in indexes:
+            index.create(conn)
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+        print(f"\níndices criados em {time.perf_counter() - start:.1f}s")
+
+        print("\n==== com os índices ====")
+        after, plans = _explain(conn, args.rows)
+
+        print("\nlookup".ljust(50), "antes (ms)".rjust(12), "depois (ms)".rjust(12), "  índice")
+        missing = []
+        for name in before:
+            unused = [index for index in EXPECTED_INDEXES[name] if f" {index} " not in plans[name]]
+            missing += unused
+            status = f"NÃO USA {', '.join(unused)}" if unused else "ok"
+            print(name.ljust(49), f"{before[name]:12.2f}", f"{after[name]:12.2f}", f"  {status}")
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            conn.commit()
+
+    if missing:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
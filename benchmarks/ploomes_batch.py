@@ -0,0 +1,117 @@
+"""
+Checks the Ploomes $batch client (workers/services/ploomes.py) against a
+local stub of the OData endpoints and compares it with sequential PATCHes.
+
+The stub knows deals/contacts 1-100; anything else answers 404, so partial
+failures can be exercised. With --no-batch the stub rejects $batch and the
+client has to fall back to one request per operation.
+
+    uv run python -m benchmarks.ploomes_batch --latency 0.3
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+
+KNOWN_IDS = set(range(1, 101))
+
+
+def _stub_app(latency: float, batch_enabled: bool, calls: list) -> Starlette:
+    def patch_entity(entity_id: int) -> tuple:
+        if entity_id not in KNOWN_IDS:
+            return 404, {"error": {"message": "Not found"}}
+        return 200, {"value": [{"Id": entity_id}]}
+
+    async def patch(request: Request) -> JSONResponse:
+        calls.append(request.url.path)
+        await request.body()
+        await asyncio.sleep(latency)
+        status, body = patch_entity(request.path_params["entity_id"])
+        return JSONResponse(body, status_code=status)
+
+    async def batch(request: Request) -> Response:
+        calls.append(request.url.path)
+        if not batch_enabled:
+            return Response(status_code=404)
+        payload = await request.json()
+        await asyncio.sleep(latency)
+        responses = []
+        for item in payload["requests"]:
+            entity_id = int(item["url"].split("(")[1].rstrip(")"))
+            status, body = patch_entity(entity_id)
+            responses.append({"id": item["id"], "status": status, "headers": {}, "body": body})
+        return JSONResponse({"responses": responses})
+
+    return Starlette(routes=[
+        Route("/Deals({entity_id:int})", patch, methods=["PATCH"]),
+        Route("/Contacts({entity_id:int})", patch, methods=["PATCH"]),
+        Route("/$batch", batch, methods=["POST"]),
+    ])
+
+
+def _start_stub(latency: float, batch_enabled: bool, calls: list) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    config = uvicorn.Config(
+        _stub_app(latency, batch_enabled, calls), host="127.0.0.1", port=port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub latency per request (s)")
+    parser.add_argument("--no-batch", action="store_true", help="stub rejects $batch (fallback path)")
+    args = parser.parse_args()
+
+    import workers.services.ploomes as ploomes
+    from api.settings import api_settings
+
+    api_settings.ploomes_user_key = api_settings.ploomes_user_key or "benchmark"
+    calls: list = []
+    ploomes.PLOOMES_BASE_URL = _start_stub(args.latency, not args.no_batch, calls)
+
+    deal_op = ploomes.update_deal_operation(deal_id=10, stage_id=110128042, next_owner_id=7)
+    contact_op = ploomes.update_contact_operation(contact_id=20, revenue_range="R$ 25-50 mil")
+
+    # Lote completo
+    calls.clear()
+    start = time.perf_counter()
+    results = ploomes.execute_batch([deal_op, contact_op])
+    batch_elapsed = time.perf_counter() - start
+    assert [r.status for r in results] == [200, 200], results
+    assert [r.operation for r in results] == [deal_op, contact_op]
+    print(f"batch ok: {len(calls)} request(s) em {batch_elapsed * 1000:.0f}ms -> {[r.status for r in results]}")
+
+    # Falha parcial: o negócio não existe, o contato sim
+    missing_deal = ploomes.update_deal_operation(deal_id=999, stage_id=110128042)
+    results = ploomes.execute_batch([missing_deal, contact_op])
+    assert [r.ok for r in results] == [False, True], results
+    assert results[0].status == 404
+    print(f"falha parcial: {[(r.operation.url, r.status) for r in results]}")
+
+    # Referência: os dois PATCHes em sequência, como antes
+    calls.clear()
+    start = time.perf_counter()
+    ploomes.update_deal(deal_id=10, stage_id=110128042, next_owner_id=7)
+    ploomes.update_contact(contact_id=20, revenue_range="R$ 25-50 mil")
+    sequential_elapsed = time.perf_counter() - start
+    print(f"sequencial: {len(calls)} request(s) em {sequential_elapsed * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Offline benchmark of the render stage of process_webhook (layout + PDF
+serialization), without the LLM, Drive or the database.
+
+Each corpus document runs in its own spawned process so peak RSS is per
+document. Results are written to JSON so two commits can be compared:
+
+    uv run python -m benchmarks.render --runs 5 --output before.json
+    uv run python -m benchmarks.render --runs 5 --output after.json
+    uv run python -m benchmarks.render --compare before.json after.json
+
+--check-heights compares the "measure" strategy with the binary search on
+benchmarks.corpus.build_height_corpus(): the heights must agree within 1mm
+and the measurement must not fall back to the search (exits 1 otherwise).
+
+    uv run python -m benchmarks.render --check-heights
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _bench_document(html: str, runs: int) -> Dict[str, Any]:
+    from workers.services.pdf import get_render_context, render_single_page
+
+    get_render_context()
+    latencies = []
+    passes = []
+    height_mm = 0
+    pdf_size = 0
+
+    wall_start = time.perf_counter()
+    for _ in range(runs):
+        start = time.perf_counter()
+        rendered = render_single_page(html)
+        pdf = rendered.document.write_pdf()
+        latencies.append((time.perf_counter() - start) * 1000)
+        passes.append(rendered.layout_passes)
+        height_mm = rendered.height_mm
+        pdf_size = len(pdf)
+    wall_ms = (time.perf_counter() - wall_start) * 1000
+
+    return {
+        "runs": runs,
+        "html_bytes": len(html.encode("utf-8")),
+        "height_mm": height_mm,
+        "layout_passes": max(passes),
+        "wall_ms": round(wall_ms, 1),
+        "p50_ms": round(_percentile(latencies, 50), 1),
+        "p95_ms": round(_percentile(latencies, 95), 1),
+        # ru_maxrss é em KB no Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "pdf_bytes": pdf_size,
+    }
+
+
+def _check_document(html: str) -> Dict[str, Any]:
+    from api.settings import api_settings
+    from workers.services.pdf import (
+        MAX_PAGE_HEIGHT_MM, MIN_PAGE_HEIGHT_MM, _search_single_page, render_single_page,
+    )
+
+    api_settings.pdf_height_strategy = "measure"
+    measured = render_single_page(html)
+    searched = _search_single_page(html, MIN_PAGE_HEIGHT_MM, MAX_PAGE_HEIGHT_MM)
+    return {
+        "measured_mm": measured.height_mm,
+        "search_mm": searched.height_mm,
+        "measure_passes": measured.layout_passes,
+        "search_passes": searched.layout_passes,
+        # Mais de 2 passes no modo "measure" = a altura medida não bastou
+        "fallback": measured.layout_passes > 2,
+    }
+
+
+def check_heights() -> bool:
+    from benchmarks.corpus import build_height_corpus
+
+    results = {name: _check_document(html) for name, html in build_height_corpus().items()}
+    ok = True
+    for name, result in results.items():
+        diff = result["measured_mm"] - result["search_mm"]
+        doc_ok = abs(diff) <= 1 and not result["fallback"]
+        ok = ok and doc_ok
+        print(
+            f"{name:>12}: medida {result['measured_mm']}mm ({result['measure_passes']} passes) | "
+            f"busca {result['search_mm']}mm ({result['search_passes']} passes) | "
+            f"diferença {diff:+d}mm{' | fallback' if result['fallback'] else ''} -> "
+            f"{'ok' if doc_ok else 'FALHOU'}"
+        )
+    fallbacks = sum(result["fallback"] for result in results.values())
+    print(f"fallback para a busca: {fallbacks}/{len(results)} documentos")
+    return ok
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(runs: int) -> Dict[str, Any]:
+    from benchmarks.corpus import build_corpus
+    import weasyprint
+
+    ctx = multiprocessing.get_context("spawn")
+    documents = {}
+    for name, html in build_corpus().items():
+        with ctx.Pool(1) as pool:
+            documents[name] = pool.apply(_bench_document, (html, runs))
+        result = documents[name]
+        print(
+            f"{name:>12}: {result['layout_passes']} passes | "
+            f"p50 {result['p50_ms']:8.1f} ms | p95 {result['p95_ms']:8.1f} ms | "
+            f"RSS {result['peak_rss_mb']:6.1f} MB | PDF {result['pdf_bytes'] / 1024:7.1f} KB"
+        )
+
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "weasyprint": weasyprint.__version__,
+        "documents": documents,
+    }
+
+
+def compare(before_path: Path, after_path: Path) -> None:
+    before = json.loads(before_path.read_text())
+    after = json.loads(after_path.read_text())
+    print(f"{before['commit']} -> {after['commit']}")
+    for name, new in after["documents"].items():
+        old = before["documents"].get(name)
+        if not old:
+            continue
+        print(f"{name:>12}:", end="")
+        for key in ("layout_passes", "p50_ms", "p95_ms", "peak_rss_mb", "pdf_bytes"):
+            delta = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+            print(f" {key} {old[key]} -> {new[key]} ({delta:+.0f}%)", end="")
+        print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=Path("benchmarks/results/render.json"))
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("BEFORE", "AFTER"))
+    parser.add_argument("--check-heights", action="store_true",
+                        help="measured vs binary-search height on the height corpus")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.check_heights:
+        if not check_heights():
+            raise SystemExit(1)
+        return
+
+    results = run(args.runs)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"Resultados salvos em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Before/after benchmark for the warm RenderContext.
+
+"inline" reproduces the previous pipeline: CSS and the base64 logo embedded
+in the HTML string, a fresh HTML/CSS parse and font lookup on every pass.
+"context" renders the same document through workers.services.pdf.
+
+    uv run python -m benchmarks.render_context --runs 10
+"""
+import argparse
+import base64
+import re
+import statistics
+import time
+
+from weasyprint import HTML
+
+from benchmarks.corpus import fill_template, sample_fields
+from workers.services.pdf import ASSETS_DIR, LOGO_URL, get_render_context
+
+
+def _inline_html(html: str) -> str:
+    logo = base64.b64encode((ASSETS_DIR / LOGO_URL).read_bytes()).decode("utf-8")
+    css = (ASSETS_DIR / "auditoria.css").read_text(encoding="utf-8")
+    html = html.replace(LOGO_URL, f"data:image/svg+xml;base64,{logo}")
+    return html.replace("</head>", f"<style>{css}</style>\n</head>")
+
+
+def _render_inline(html: str, height_mm: int) -> None:
+    modified_html = re.sub(r'--pageH:\s*\d+mm\s*;', f'--pageH: {height_mm}mm;', html)
+    HTML(string=modified_html, base_url=str(ASSETS_DIR)).render(media_type="screen")
+
+
+def _render_context(html: str, height_mm: int) -> None:
+    get_render_context().render(html, height_mm)
+
+
+def _time(fn, html: str, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(html, 2000)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--scale", type=int, default=1)
+    args = parser.parse_args()
+
+    html = fill_template(sample_fields(args.scale))
+
+    start = time.perf_counter()
+    get_render_context()
+    print(f"RenderContext construído em {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    results = {
+        "inline (antes)": _time(_render_inline, _inline_html(html), args.runs),
+        "context (depois)": _time(_render_context, html, args.runs),
+    }
+    for label, timings in results.items():
+        print(
+            f"{label:>18}: média {statistics.mean(timings):8.1f} ms | "
+            f"mediana {statistics.median(timings):8.1f} ms | "
+            f"min {min(timings):8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
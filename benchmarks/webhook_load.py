@@ -0,0 +1,104 @@
+"""
+Load test for the webhook routes against a running API and a local Postgres.
+
+Sends concurrent OPENPIX:CHARGE_COMPLETED webhooks for correlation IDs that
+do not exist (one UPDATE matching no row, no side effects) and, at the same time,
+polls /api/health. A route that blocks the event loop on the database shows
+up as /health latency growing with the webhook load.
+
+Run it once on a tree with the sync-session webhooks and once with the async
+ones (same DB_POOL_SIZE / DB_MAX_OVERFLOW) to compare:
+
+    uv run python -m benchmarks.webhook_load --url http://localhost:8000/api --concurrency 100 --duration 15
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from collections import Counter
+from typing import List
+
+import httpx
+
+
+def _summary(name: str, latencies: List[float], statuses: Counter, elapsed: float) -> str:
+    if not latencies:
+        return f"{name}: nenhuma resposta {dict(statuses)}"
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    return (
+        f"{name}: {len(latencies)} requests -> {len(latencies) / elapsed:.0f} req/s | "
+        f"p50 {statistics.median(latencies):.1f}ms p95 {p95:.1f}ms max {latencies[-1]:.1f}ms | "
+        f"status {dict(statuses)}"
+    )
+
+
+async def _sender(client: httpx.AsyncClient, url: str, headers: dict, deadline: float,
+                  latencies: List[float], statuses: Counter) -> None:
+    while time.perf_counter() < deadline:
+        payload = {
+            "event": "OPENPIX:CHARGE_COMPLETED",
+            "charge": {"status": "COMPLETED", "correlationID": f"bench-{uuid.uuid4()}"},
+        }
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, json=payload, headers=headers)
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] += 1
+
+
+async def _health(client: httpx.AsyncClient, url: str, deadline: float,
+                  latencies: List[float], statuses: Counter) -> None:
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+        except httpx.HTTPError as exc:
+            statuses[type(exc).__name__] += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] += 1
+        await asyncio.sleep(0.05)
+
+
+async def run(base_url: str, concurrency: int, duration: float, token: str) -> None:
+    base_url = base_url.rstrip("/")
+    headers = {"Authorization": token} if token else {}
+    webhook_latencies: List[float] = []
+    webhook_statuses: Counter = Counter()
+    health_latencies: List[float] = []
+    health_statuses: Counter = Counter()
+
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(
+            _health(client, f"{base_url}/health", deadline, health_latencies, health_statuses),
+            *(
+                _sender(client, f"{base_url}/webhooks/woovi", headers, deadline, webhook_latencies, webhook_statuses)
+                for _ in range(concurrency)
+            ),
+        )
+        elapsed = time.perf_counter() - start
+
+    print(_summary("webhooks/woovi", webhook_latencies, webhook_statuses, elapsed))
+    print(_summary("health", health_latencies, health_statuses, elapsed))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api", help="API prefix")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=15, help="seconds")
+    parser.add_argument("--token", default="", help="WOOVI_WEBHOOK_TOKEN, if the API checks it")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.concurrency, args.duration, args.token))
+
+
+if __name__ == "__main__":
+    main()
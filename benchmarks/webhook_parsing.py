@@ -0,0 +1,126 @@
+"""
+Per-request CPU time of the Formbricks webhook body handling, measured on a
+realistic responseFinished payload (every question of the audit form answered).
+
+- antes: decode + json.loads + WebhookPayload(**data) + model_dump(mode="json"),
+  then json.dumps when SQLAlchemy binds the JSONB column
+- validate_json: model_validate_json on the bytes + orjson.loads for storage
+- orjson: orjson.loads once, model_validate on that dict, stored as-is
+  (orjson.dumps on bind), which is what receive_webhook does
+
+    uv run python -m benchmarks.webhook_parsing --iterations 20000
+"""
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict
+
+import orjson
+
+from api.schemas import WebhookPayload
+
+
+ANSWERS = {
+    "name": "Mariana Costa Albuquerque",
+    "email": "mariana.albuquerque@example.com",
+    "instagram": "@mari.nutri.funcional",
+    "nicho": "Nutrição funcional e emagrecimento feminino",
+    "objetivo": "Vender meu programa de acompanhamento online e fechar mais consultas",
+    "publico": (
+        "Mulheres de 28 a 45 anos, mães, que já tentaram várias dietas e querem "
+        "emagrecer sem passar fome e sem abrir mão da rotina com a família."
+    ),
+    "oque_vende": "Consultas individuais, programa de 12 semanas e um e-book de receitas",
+    "ticket_medio": "R$ 1.200,00",
+    "clientes_mes": "15 a 20",
+    "total_seguidores": "18.400",
+    "postagens_semana": "4",
+    "formato_conteudo": "Reels com receitas e carrossel educativo",
+    "media_reels": "3 mil a 5 mil",
+    "taxa_conversao": "Entre 0,5% e 1%",
+    "crescimento_redes": "Estagnado nos últimos 6 meses, cresci bem no começo e depois parou",
+    "tempo_insta": "Cerca de 2 horas por dia",
+    "meta_seguidores": "50 mil",
+    "meta_faturamento_mensal": "R$ 40.000,00",
+    "faturamento_medio_atual": "R$ 10-25 mil",
+}
+
+
+def formbricks_body() -> bytes:
+    """A Formbricks responseFinished delivery as sent to /api/webhooks/form."""
+    payload = {
+        "webhookId": "whk_01hzyx8k2v3m4n5p6q7r8s9t0u",
+        "event": "responseFinished",
+        "data": {
+            "id": "resp_01hzyx9a1b2c3d4e5f6g7h8j9k",
+            "createdAt": "2026-10-17T12:31:05.214Z",
+            "updatedAt": "2026-10-17T12:38:41.902Z",
+            "surveyId": "srv_01hzy0000auditoria0000000",
+            "displayId": "dsp_01hzyx8z9y8x7w6v5u4t3s2r1q",
+            "contact": None,
+            "contactAttributes": {},
+            "finished": True,
+            "endingId": "end_default",
+            "data": ANSWERS,
+            "variables": {},
+            "ttc": {key: round(3.5 + i * 1.37, 2) for i, key in enumerate(ANSWERS)},
+            "tags": [],
+            "meta": {
+                "url": "https://forms.spreed-automacao.com.br/s/auditoria?utm_source=whatsapp",
+                "userAgent": {"browser": "Chrome", "os": "Android", "device": "phone"},
+            },
+            "singleUseId": None,
+            "language": "default",
+            "survey": {
+                "title": "Auditoria Estratégica de Perfil",
+                "type": "link",
+                "status": "inProgress",
+                "createdAt": "2026-01-10T09:00:00.000Z",
+                "updatedAt": "2026-09-02T15:20:11.000Z",
+            },
+        },
+    }
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def before(body: bytes) -> str:
+    payload = WebhookPayload(**json.loads(body.decode("utf-8")))
+    return json.dumps(payload.model_dump(mode="json"))
+
+
+def validate_json(body: bytes) -> bytes:
+    WebhookPayload.model_validate_json(body)
+    return orjson.dumps(orjson.loads(body))
+
+
+def orjson_path(body: bytes) -> bytes:
+    raw: Dict[str, Any] = orjson.loads(body)
+    WebhookPayload.model_validate(raw)
+    return orjson.dumps(raw)
+
+
+def _cpu_us(fn: Callable[[bytes], Any], body: bytes, iterations: int) -> float:
+    for _ in range(min(1000, iterations)):
+        fn(body)
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(body)
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    body = formbricks_body()
+    print(f"payload: {len(body)} bytes, {args.iterations} iterações")
+    baseline = None
+    for name, fn in (("antes", before), ("validate_json", validate_json), ("orjson", orjson_path)):
+        us = _cpu_us(fn, body, args.iterations)
+        baseline = baseline or us
+        print(f"{name:<14} {us:8.1f} µs CPU/request  ({baseline / us:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
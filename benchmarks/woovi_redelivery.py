@@ -0,0 +1,101 @@
+"""
+Load test for duplicate Woovi deliveries: fires the same
+OPENPIX:CHARGE_COMPLETED webhook concurrently at a running API and checks that
+exactly one delivery per round completes the charge (and enqueues the
+WhatsApp / Ploomes actors); the others must answer "no change".
+
+Side effects: this is not a dry run. Before each round the charge's status
+is reset to pending directly in DATABASE_URL, and every round that completes
+it enqueues real send_purchase_confirmation_whatsapp and
+track_purchase_ploomes_task jobs on the API's broker. Any worker consuming
+that broker sends the WhatsApp confirmation to the charge's customer and
+creates the Ploomes deal, once per round. Use a test charge whose
+customer_phone is your own, and an API/broker with no worker running (or
+one pointed at sandbox providers). The run refuses to start without
+--allow-side-effects.
+
+    uv run python -m benchmarks.woovi_redelivery --correlation-id <id> --concurrency 50 --rounds 5 --allow-side-effects
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from typing import List
+
+import httpx
+from sqlalchemy import create_engine, update
+
+from api.settings import api_settings
+from db.models import Charge
+
+
+async def _round(client: httpx.AsyncClient, url: str, headers: dict, correlation_id: str,
+                 concurrency: int, latencies: List[float]) -> Counter:
+    payload = {
+        "event": "OPENPIX:CHARGE_COMPLETED",
+        "charge": {"status": "COMPLETED", "correlationID": correlation_id},
+    }
+
+    async def deliver() -> str:
+        start = time.perf_counter()
+        response = await client.post(url, json=payload, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            return f"http {response.status_code}"
+        return response.json().get("message", "completed")
+
+    return Counter(await asyncio.gather(*(deliver() for _ in range(concurrency))))
+
+
+async def run(base_url: str, correlation_id: str, concurrency: int, rounds: int, token: str) -> bool:
+    engine = create_engine(api_settings.database_url)
+    headers = {"Authorization": token} if token else {}
+    url = f"{base_url.rstrip('/')}/webhooks/woovi"
+    latencies: List[float] = []
+    ok = True
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        for round_number in range(1, rounds + 1):
+            with engine.begin() as conn:
+                reset = conn.execute(
+                    update(Charge).where(Charge.correlation_id == correlation_id).values(status="pending")
+                )
+            if not reset.rowcount:
+                raise SystemExit(f"cobrança {correlation_id} não encontrada")
+
+            outcomes = await _round(client, url, headers, correlation_id, concurrency, latencies)
+            transitions = outcomes.get("completed", 0)
+            ok = ok and transitions == 1
+            print(f"rodada {round_number}: {dict(outcomes)} -> {'ok' if transitions == 1 else 'FALHOU'}")
+
+    latencies.sort()
+    print(
+        f"{len(latencies)} entregas | p50 {statistics.median(latencies):.1f}ms "
+        f"p95 {latencies[max(0, int(len(latencies) * 0.95) - 1)]:.1f}ms"
+    )
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api", help="API prefix")
+    parser.add_argument("--correlation-id", required=True, help="existing test charge")
+    parser.add_argument("--concurrency", type=int, default=50, help="duplicate deliveries per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--token", default="", help="WOOVI_WEBHOOK_TOKEN, if the API checks it")
+    parser.add_argument("--allow-side-effects", action="store_true",
+                        help="reset the charge and enqueue the real WhatsApp / Ploomes jobs each round")
+    args = parser.parse_args()
+    if not args.allow_side_effects:
+        parser.error(
+            "cada rodada reseta a cobrança e enfileira o WhatsApp e o Ploomes de verdade; "
+            "use uma cobrança de teste e passe --allow-side-effects"
+        )
+    if not asyncio.run(run(args.url, args.correlation_id, args.concurrency, args.rounds, args.token)):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import DateTime, Integer, String, Text
+from sqlalchemy import Boolean, DateTime, Index, Integer, String, Text, false, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
@@ -11,20 +11,60 @@ class Base(DeclarativeBase):
 
 class WebhookRequest(Base):
     __tablename__ = "webhook_requests"
+    __table_args__ = (
+        # Último formulário por email / telefone (track_booking_ploomes_task)
+        Index("ix_webhook_requests_email_created_at", "email", "created_at"),
+        Index("ix_webhook_requests_phone_created_at", "phone", "created_at"),
+        # Idempotência da ingestão (INSERT ... ON CONFLICT em receive_webhook)
+        Index("uq_webhook_requests_delivery_id", "delivery_id", unique=True),
+        Index("uq_webhook_requests_response_id", "response_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=datetime.utcnow, nullable=False
     )
     payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    # buffered (resposta incompleta), queued, processing, generating, deferred, done, failed
     status: Mapped[str] = mapped_column(String(32), nullable=False, default="queued")
+    delivery_id: Mapped[str | None] = mapped_column(String(255))  # header webhook-id
+    response_id: Mapped[str | None] = mapped_column(String(255))  # data.id do Formbricks
+
+    # Respostas canônicas extraídas do payload na ingestão (api.utils.extract_form_fields)
+    email: Mapped[str | None] = mapped_column(String(255))
+    phone: Mapped[str | None] = mapped_column(String(20))  # normalizado (só dígitos, com 55)
+    instagram: Mapped[str | None] = mapped_column(String(255))  # sem @
+    revenue_range: Mapped[str | None] = mapped_column(String(255))
+    finished: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=false(), nullable=False
+    )
+    survey_id: Mapped[str | None] = mapped_column(String(64))
+
     pdf_filename: Mapped[str | None] = mapped_column(String(255))
     drive_file_id: Mapped[str | None] = mapped_column(String(255))
     error_message: Mapped[str | None] = mapped_column(Text)
 
+    # Pipeline checkpoints (process_webhook resumes from the first missing stage)
+    generated_html: Mapped[str | None] = mapped_column(Text)
+    page_height_mm: Mapped[int | None] = mapped_column(Integer)
+    pdf_sha256: Mapped[str | None] = mapped_column(String(64))
+    start_message_sent: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=false(), nullable=False
+    )
+    # Estágio assíncrono do LLM (LLM_STAGE_MODE=async): tentativas e início da atual
+    llm_attempts: Mapped[int] = mapped_column(
+        Integer, default=0, server_default=text("0"), nullable=False
+    )
+    llm_started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
 
 class Charge(Base):
     __tablename__ = "charges"
+    __table_args__ = (
+        # Última cobrança por email / telefone (process_webhook, track_booking_ploomes_task)
+        Index("ix_charges_customer_email_created_at", "customer_email", "created_at"),
+        Index("ix_charges_customer_phone_created_at", "customer_phone", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     correlation_id: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
@@ -61,6 +101,14 @@ class Lead(Base):
     Used to track users who started the funnel but haven't converted yet.
     """
     __tablename__ = "leads"
+    __table_args__ = (
+        # export_leads: só os leads não convertidos (apagados a cada exportação)
+        Index(
+            "ix_leads_not_converted",
+            "created_at",
+            postgresql_where=text("NOT has_purchased AND NOT has_booked"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -1,16 +1,54 @@
+import orjson
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from api.settings import api_settings
 
 
-engine = create_engine(api_settings.database_url, pool_pre_ping=True)
+def _json_dumps(value) -> str:
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+_pool_options = dict(
+    pool_pre_ping=True,
+    pool_size=api_settings.db_pool_size,
+    max_overflow=api_settings.db_max_overflow,
+    pool_timeout=api_settings.db_pool_timeout,
+    pool_recycle=api_settings.db_pool_recycle,
+    # Colunas JSONB (payload dos webhooks) serializadas com orjson
+    json_serializer=_json_dumps,
+    json_deserializer=orjson.loads,
+)
+
+engine = create_engine(api_settings.database_url, **_pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def _async_database_url() -> str:
+    if api_settings.database_async_url:
+        return api_settings.database_async_url
+    url = make_url(api_settings.database_url).set(drivername="postgresql+asyncpg")
+    # asyncpg não entende sslmode (libpq); o equivalente é ssl
+    if "sslmode" in url.query:
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": url.query["sslmode"]})
+    return url.render_as_string(hide_password=False)
+
+
+# Para as rotas async: as queries não bloqueiam o event loop
+async_engine = create_async_engine(_async_database_url(), **_pool_options)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
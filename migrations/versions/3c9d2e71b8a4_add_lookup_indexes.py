@@ -0,0 +1,49 @@
+"""add_lookup_indexes
+
+Revision ID: 3c9d2e71b8a4
+Revises: fab826e6dbc9
+Create Date: 2026-10-17 14:05:27.590163
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9d2e71b8a4'
+down_revision: Union[str, None] = 'fab826e6dbc9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY não roda dentro de transação e não bloqueia escritas nas tabelas
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_charges_customer_email_created_at', 'charges', ['customer_email', 'created_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_charges_customer_phone_created_at', 'charges', ['customer_phone', 'created_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_leads_not_converted', 'leads', ['created_at'],
+            postgresql_where=sa.text('NOT has_purchased AND NOT has_booked'),
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_leads_not_converted', table_name='leads', postgresql_concurrently=True, if_exists=True)
+        op.drop_index(
+            'ix_charges_customer_phone_created_at', table_name='charges',
+            postgresql_concurrently=True, if_exists=True,
+        )
+        op.drop_index(
+            'ix_charges_customer_email_created_at', table_name='charges',
+            postgresql_concurrently=True, if_exists=True,
+        )
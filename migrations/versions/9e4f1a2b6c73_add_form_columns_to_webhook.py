@@ -0,0 +1,107 @@
+"""add_form_columns_to_webhook
+
+Revision ID: 9e4f1a2b6c73
+Revises: 3c9d2e71b8a4
+Create Date: 2026-10-17 16:40:12.803511
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4f1a2b6c73'
+down_revision: Union[str, None] = '3c9d2e71b8a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 5000
+
+# Mesmas regras de api.utils.extract_form_fields, um lote de ids por vez
+BACKFILL_SQL = r"""
+WITH batch AS (
+    SELECT r.id,
+           r.payload -> 'data' AS data,
+           r.payload -> 'data' -> 'data' AS answers,
+           regexp_replace(coalesce(
+               nullif(btrim(r.payload -> 'data' -> 'data' ->> 'phone'), ''),
+               nullif(btrim(r.payload -> 'data' -> 'data' ->> 'telefone'), ''),
+               nullif(btrim(r.payload -> 'data' -> 'data' ->> 'whatsapp'), '')
+           ), '\D', '', 'g') AS digits
+    FROM webhook_requests r
+    WHERE r.id > :last_id
+    ORDER BY r.id
+    LIMIT :batch_size
+), updated AS (
+    UPDATE webhook_requests w SET
+        email = nullif(left(btrim(b.answers ->> 'email'), 255), ''),
+        phone = CASE
+            WHEN length(b.digits) IN (10, 11) AND b.digits NOT LIKE '55%' THEN '55' || b.digits
+            WHEN length(b.digits) BETWEEN 1 AND 20 THEN b.digits
+        END,
+        instagram = nullif(btrim(ltrim(left(btrim(b.answers ->> 'instagram'), 255), '@')), ''),
+        revenue_range = nullif(left(btrim(b.answers ->> 'faturamento_medio_atual'), 255), ''),
+        finished = coalesce(b.data -> 'finished' = 'true'::jsonb, false),
+        survey_id = nullif(left(btrim(b.data ->> 'surveyId'), 64), '')
+    FROM batch b
+    WHERE w.id = b.id
+    RETURNING w.id
+)
+SELECT max(id), count(*) FROM updated
+"""
+
+
+def upgrade() -> None:
+    op.add_column('webhook_requests', sa.Column('email', sa.String(length=255), nullable=True))
+    op.add_column('webhook_requests', sa.Column('phone', sa.String(length=20), nullable=True))
+    op.add_column('webhook_requests', sa.Column('instagram', sa.String(length=255), nullable=True))
+    op.add_column('webhook_requests', sa.Column('revenue_range', sa.String(length=255), nullable=True))
+    op.add_column(
+        'webhook_requests',
+        sa.Column('finished', sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+    op.add_column('webhook_requests', sa.Column('survey_id', sa.String(length=64), nullable=True))
+
+    # Backfill em lotes, cada um na sua transação: não segura locks na tabela inteira
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        last_id, total = 0, 0
+        while True:
+            max_id, count = bind.execute(
+                sa.text(BACKFILL_SQL), {"last_id": last_id, "batch_size": BATCH_SIZE}
+            ).one()
+            if not count:
+                break
+            last_id, total = max_id, total + count
+            print(f"backfill webhook_requests: {total} linhas (até id {last_id})")
+
+        op.create_index(
+            'ix_webhook_requests_email_created_at', 'webhook_requests', ['email', 'created_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_webhook_requests_phone_created_at', 'webhook_requests', ['phone', 'created_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_webhook_requests_phone_created_at', table_name='webhook_requests',
+            postgresql_concurrently=True, if_exists=True,
+        )
+        op.drop_index(
+            'ix_webhook_requests_email_created_at', table_name='webhook_requests',
+            postgresql_concurrently=True, if_exists=True,
+        )
+
+    op.drop_column('webhook_requests', 'survey_id')
+    op.drop_column('webhook_requests', 'finished')
+    op.drop_column('webhook_requests', 'revenue_range')
+    op.drop_column('webhook_requests', 'instagram')
+    op.drop_column('webhook_requests', 'phone')
+    op.drop_column('webhook_requests', 'email')
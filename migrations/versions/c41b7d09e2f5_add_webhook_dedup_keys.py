@@ -0,0 +1,62 @@
+"""add_webhook_dedup_keys
+
+Revision ID: c41b7d09e2f5
+Revises: 9e4f1a2b6c73
+Create Date: 2026-10-17 18:22:05.117840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41b7d09e2f5'
+down_revision: Union[str, None] = '9e4f1a2b6c73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Duplicatas antigas da mesma resposta: só a mais recente fica com o response_id
+BACKFILL_SQL = """
+UPDATE webhook_requests w SET response_id = latest.response_id
+FROM (
+    SELECT DISTINCT ON (payload #>> '{data,id}') id, payload #>> '{data,id}' AS response_id
+    FROM webhook_requests
+    WHERE payload #>> '{data,id}' IS NOT NULL
+    ORDER BY payload #>> '{data,id}', created_at DESC, id DESC
+) latest
+WHERE w.id = latest.id
+"""
+
+
+def upgrade() -> None:
+    op.add_column('webhook_requests', sa.Column('delivery_id', sa.String(length=255), nullable=True))
+    op.add_column('webhook_requests', sa.Column('response_id', sa.String(length=255), nullable=True))
+    op.execute(BACKFILL_SQL)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'uq_webhook_requests_delivery_id', 'webhook_requests', ['delivery_id'], unique=True,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'uq_webhook_requests_response_id', 'webhook_requests', ['response_id'], unique=True,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'uq_webhook_requests_response_id', table_name='webhook_requests',
+            postgresql_concurrently=True, if_exists=True,
+        )
+        op.drop_index(
+            'uq_webhook_requests_delivery_id', table_name='webhook_requests',
+            postgresql_concurrently=True, if_exists=True,
+        )
+
+    op.drop_column('webhook_requests', 'response_id')
+    op.drop_column('webhook_requests', 'delivery_id')
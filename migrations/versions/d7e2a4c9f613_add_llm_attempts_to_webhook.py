@@ -0,0 +1,34 @@
+"""add_llm_attempts_to_webhook
+
+Revision ID: d7e2a4c9f613
+Revises: c41b7d09e2f5
+Create Date: 2026-10-17 19:05:37.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7e2a4c9f613'
+down_revision: Union[str, None] = 'c41b7d09e2f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'webhook_requests',
+        sa.Column('llm_attempts', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'webhook_requests',
+        sa.Column('llm_started_at', sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('webhook_requests', 'llm_started_at')
+    op.drop_column('webhook_requests', 'llm_attempts')
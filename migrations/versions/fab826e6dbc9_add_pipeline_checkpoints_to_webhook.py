@@ -0,0 +1,35 @@
+"""add_pipeline_checkpoints_to_webhook
+
+Revision ID: fab826e6dbc9
+Revises: 7a43352f2082
+Create Date: 2026-10-17 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fab826e6dbc9'
+down_revision: Union[str, None] = '7a43352f2082'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('webhook_requests', sa.Column('generated_html', sa.Text(), nullable=True))
+    op.add_column('webhook_requests', sa.Column('page_height_mm', sa.Integer(), nullable=True))
+    op.add_column('webhook_requests', sa.Column('pdf_sha256', sa.String(length=64), nullable=True))
+    op.add_column(
+        'webhook_requests',
+        sa.Column('start_message_sent', sa.Boolean(), server_default=sa.false(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('webhook_requests', 'start_message_sent')
+    op.drop_column('webhook_requests', 'pdf_sha256')
+    op.drop_column('webhook_requests', 'page_height_mm')
+    op.drop_column('webhook_requests', 'generated_html')
@@ -208,6 +208,15 @@ async function onSubmit(e) {
     const initialData = await createPixCharge(payload);
     const chargeId = initialData.id;
 
+    // PIX already created by the fast path: the payment page renders it without waiting
+    if (initialData.br_code) {
+      try {
+        sessionStorage.setItem(`charge:${chargeId}`, JSON.stringify(initialData));
+      } catch {
+        // sessionStorage unavailable: payment page falls back to polling
+      }
+    }
+
     setStatus("Redirecionando para o pagamento...");
 
     // Redirect to the dedicated payment page
@@ -5,6 +5,8 @@ const params = new URLSearchParams(window.location.search);
 const chargeId = params.get("id");
 let countdownInterval = null;
 let pollInterval = null;
+let eventSource = null;
+let streamErrors = 0;
 let isPixRendered = false;
 
 // Strict validation on load: only allows pure digits (0-9)
@@ -33,8 +35,50 @@ async function fetchStatus() {
     }
 }
 
+function readCreatedCharge() {
+    // Set by the checkout page when POST /api/checkout already returned the PIX
+    try {
+        const stored = sessionStorage.getItem(`charge:${chargeId}`);
+        if (!stored) return null;
+        sessionStorage.removeItem(`charge:${chargeId}`);
+        return JSON.parse(stored);
+    } catch {
+        return null;
+    }
+}
+
+function startStream() {
+    // Server-Sent Events: the API pushes the charge state as soon as it changes
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+
+    eventSource = new EventSource(`${API_URL}/${chargeId}/events`);
+
+    eventSource.addEventListener("charge", (event) => {
+        streamErrors = 0;
+        try {
+            handleState(JSON.parse(event.data));
+        } catch (e) {
+            console.error("Evento inválido:", e);
+        }
+    });
+
+    eventSource.onerror = () => {
+        streamErrors += 1;
+        // The browser reconnects by itself; fall back to polling if the stream keeps failing
+        if (eventSource.readyState === EventSource.CLOSED || streamErrors >= 3) {
+            eventSource.close();
+            eventSource = null;
+            startPolling();
+        }
+    };
+}
+
 async function startPolling() {
     if (!chargeId || !/^\d+$/.test(chargeId)) return;
+    if (pollInterval) return;
 
     // Initial check
     const initialData = await fetchStatus();
@@ -72,6 +116,10 @@ function handleState(data) {
 }
 
 function stopAll() {
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
     if (pollInterval) clearInterval(pollInterval);
     if (countdownInterval) clearInterval(countdownInterval);
 }
@@ -156,4 +204,13 @@ function showCopyFeedback() {
     }, 2000);
 }
 
-document.addEventListener("DOMContentLoaded", startPolling);
+function init() {
+    const createdData = readCreatedCharge();
+    if (createdData) {
+        handleState(createdData);
+    }
+
+    startStream();
+}
+
+document.addEventListener("DOMContentLoaded", init);
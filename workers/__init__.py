@@ -1,3 +1,9 @@
-from workers.tasks import process_webhook
-
 __all__ = ["process_webhook"]
+
+
+def __getattr__(name):
+    # Sob demanda: importar workers.queue (API) não deve carregar os actors e suas dependências
+    if name == "process_webhook":
+        from workers.tasks import process_webhook
+        return process_webhook
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
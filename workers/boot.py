@@ -0,0 +1,69 @@
+"""
+Worker process boot: builds the expensive shared objects once per Dramatiq
+process, before the worker threads start consuming, so the first job after
+a deploy is not slower than the others.
+"""
+import time
+
+from dramatiq import Middleware
+
+from api.settings import api_settings
+
+
+# Tempo máximo para concluir gerações em andamento no shutdown
+LLM_DRAIN_TIMEOUT = 120
+
+
+class WorkerBootMiddleware(Middleware):
+    def after_process_boot(self, broker) -> None:
+        from workers.services.gdrive import warm_drive
+        from workers.services.llm_stage import get_llm_stage
+        from workers.services.openai_client import _load_assets, get_client
+        from workers.services.pdf import get_render_context
+        from workers.services.render_pool import get_render_pool
+
+        steps = [
+            ("openai", get_client),
+            ("assets", _load_assets),
+            ("drive", warm_drive),
+            (
+                "render",
+                get_render_context if api_settings.pdf_render_processes == 0 else get_render_pool,
+            ),
+        ]
+
+        if api_settings.llm_stage_mode == "async" or api_settings.openai_generation_mode == "sections":
+            steps.insert(1, ("llm_stage", get_llm_stage))
+        if api_settings.llm_stage_mode == "async":
+            from workers.tasks import recover_stale_generations
+
+            # Linhas em "generating" de um worker que morreu com o LLM em andamento
+            steps.append(("llm_recovery", recover_stale_generations))
+
+        boot_start = time.perf_counter()
+        timings = []
+        for label, build in steps:
+            start = time.perf_counter()
+            try:
+                build()
+                timings.append(f"{label} {(time.perf_counter() - start) * 1000:.0f}ms")
+            except Exception as exc:  # noqa: BLE001
+                # Não impede o boot: o objeto é criado no primeiro uso
+                timings.append(f"{label} falhou")
+                print(f"WORKER BOOT: erro ao preparar {label}: {exc}")
+
+        total = time.perf_counter() - boot_start
+        print(f"WORKER BOOT: pronto em {total:.2f}s ({', '.join(timings)})")
+
+    def before_worker_shutdown(self, broker, worker) -> None:
+        from workers.services.http import close_clients, pool_stats
+        from workers.services.llm_stage import close_llm_stage
+
+        close_llm_stage(timeout=LLM_DRAIN_TIMEOUT)
+
+        for host, counters in pool_stats().items():
+            print(
+                f"HTTP POOL {host}: {counters['hits']} reusadas, "
+                f"{counters['misses']} novas conexões, {counters['retries']} retries"
+            )
+        close_clients()
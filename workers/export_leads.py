@@ -6,6 +6,7 @@ Usage:
     uv run python workers/export_leads.py
 """
 import csv
+import io
 from datetime import datetime
 from pathlib import Path
 
@@ -31,40 +32,37 @@ def export_and_cleanup_leads():
             print("✅ Nenhum lead não convertido encontrado.")
             return
         
-        # Create exports directory if it doesn't exist
-        exports_dir = Path(__file__).parent.parent / "exports"
-        exports_dir.mkdir(exist_ok=True)
-        
         # Generate filename with timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_filename = exports_dir / f"leads_nao_convertidos_{timestamp}.csv"
+        csv_name = f"leads_nao_convertidos_{timestamp}.csv"
         
-        # Write to CSV
-        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['id', 'name', 'phone', 'created_at', 'updated_at']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            for lead in non_converted_leads:
-                writer.writerow({
-                    'id': lead.id,
-                    'name': lead.name,
-                    'phone': lead.phone,
-                    'created_at': lead.created_at.isoformat(),
-                    'updated_at': lead.updated_at.isoformat()
-                })
+        # Write CSV in memory
+        buffer = io.StringIO(newline='')
+        fieldnames = ['id', 'name', 'phone', 'created_at', 'updated_at']
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
         
-        print(f"✅ CSV gerado: {csv_filename}")
+        writer.writeheader()
+        for lead in non_converted_leads:
+            writer.writerow({
+                'id': lead.id,
+                'name': lead.name,
+                'phone': lead.phone,
+                'created_at': lead.created_at.isoformat(),
+                'updated_at': lead.updated_at.isoformat()
+            })
+        csv_bytes = buffer.getvalue().encode('utf-8')
+        
+        print(f"✅ CSV gerado: {csv_name}")
         print(f"📊 Total de leads não convertidos: {len(non_converted_leads)}")
         
-        # Upload to Google Drive
+        # Upload to Google Drive (streamed from memory)
         try:
             from workers.services.gdrive import upload_file
             from api.settings import api_settings
             
             drive_info = upload_file(
-                file_path=csv_filename,
-                filename=csv_filename.name,
+                file=io.BytesIO(csv_bytes),
+                filename=csv_name,
                 folder_id=api_settings.google_drive_csv_folder_id,
                 mimetype="text/csv"
             )
@@ -73,11 +71,12 @@ def export_and_cleanup_leads():
             print(f"🔗 Link: {drive_info.get('webViewLink')}")
             print(f"📁 File ID: {drive_info.get('id')}")
             
-            # Delete local file after successful upload
-            csv_filename.unlink()
-            print(f"🗑️  Arquivo local removido: {csv_filename}")
-            
         except Exception as upload_error:
+            # Only touch the disk when the upload fails
+            exports_dir = Path(__file__).parent.parent / "exports"
+            exports_dir.mkdir(exist_ok=True)
+            csv_filename = exports_dir / csv_name
+            csv_filename.write_bytes(csv_bytes)
             print(f"⚠️  Erro ao fazer upload para o Drive: {upload_error}")
             print(f"📁 CSV mantido localmente em: {csv_filename}")
         
@@ -0,0 +1,72 @@
+"""
+Broker and enqueue-only actor handles for the API.
+
+The API sends messages by actor name through these handles instead of
+importing workers.tasks, which would load WeasyPrint, OpenAI and the Google
+client in every API process. The implementations live in workers.tasks, which
+declares its actors on this same broker and checks at import time that every
+handle below has a matching actor.
+"""
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple, Union
+
+from dramatiq import Message
+from dramatiq.brokers.redis import RedisBroker
+
+from api.settings import api_settings
+
+
+broker = RedisBroker(url=api_settings.dramatiq_broker_url)
+
+
+class ActorRef:
+    """
+    Enqueue-only handle for an actor declared in workers.tasks (same name and queue).
+    send() is a blocking Redis call: async routes run it through run_in_threadpool.
+    """
+
+    def __init__(self, actor_name: str, queue_name: str = "default") -> None:
+        self.actor_name = actor_name
+        self.queue_name = queue_name
+
+    def send(self, *args: Any, **kwargs: Any) -> Message:
+        return self.send_with_options(args=args, kwargs=kwargs)
+
+    def send_with_options(
+        self,
+        *,
+        args: Tuple = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        delay: Optional[Union[timedelta, int]] = None,
+        **options: Any,
+    ) -> Message:
+        if isinstance(delay, timedelta):
+            delay = int(delay.total_seconds() * 1000)
+        message = Message(
+            queue_name=self.queue_name,
+            actor_name=self.actor_name,
+            args=args,
+            kwargs=kwargs or {},
+            options=options,
+        )
+        return broker.enqueue(message, delay=delay)
+
+    def __repr__(self) -> str:
+        return f"ActorRef({self.actor_name!r}, queue={self.queue_name!r})"
+
+
+process_webhook = ActorRef("process_webhook")
+create_woovi_charge_task = ActorRef("create_woovi_charge_task")
+send_purchase_confirmation_whatsapp = ActorRef("send_purchase_confirmation_whatsapp")
+send_cal_booking_confirmation_whatsapp = ActorRef("send_cal_booking_confirmation_whatsapp")
+track_purchase_ploomes_task = ActorRef("track_purchase_ploomes_task")
+track_booking_ploomes_task = ActorRef("track_booking_ploomes_task")
+
+ACTOR_REFS = (
+    process_webhook,
+    create_woovi_charge_task,
+    send_purchase_confirmation_whatsapp,
+    send_cal_booking_confirmation_whatsapp,
+    track_purchase_ploomes_task,
+    track_booking_ploomes_task,
+)
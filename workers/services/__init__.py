@@ -1,4 +1,12 @@
-from workers.services.gdrive import upload_pdf
-from workers.services.openai_client import generate_html
-
 __all__ = ["generate_html", "upload_pdf"]
+
+
+def __getattr__(name):
+    # Sob demanda: a API usa serviços leves (woovi, charge_events) sem carregar OpenAI e Google
+    if name == "generate_html":
+        from workers.services.openai_client import generate_html
+        return generate_html
+    if name == "upload_pdf":
+        from workers.services.gdrive import upload_pdf
+        return upload_pdf
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,110 @@
+"""
+Sections of the audit generated as independent LLM requests.
+
+In OPENAI_GENERATION_MODE=sections every section below is requested at the
+same time with the same customer context and its own slice of the template
+fields, so generation takes about as long as the slowest section. Model and
+token limit can be changed per section through OPENAI_SECTION_OVERRIDES.
+"""
+from dataclasses import dataclass
+from typing import Tuple
+
+from api.settings import api_settings
+from workers.services.audit_template import AUDIT_TEMPLATE
+
+
+# Não existe no template: é gerado à parte e colocado no início da conclusão
+VIRALIZATION_FIELD = "viralizacao_html"
+
+
+@dataclass(frozen=True)
+class AuditSection:
+    name: str
+    fields: Tuple[str, ...]
+    instructions: str
+    max_output_tokens: int
+
+    @property
+    def model(self) -> str:
+        override = api_settings.openai_section_overrides.get(self.name, {})
+        return override.get("model") or api_settings.openai_model
+
+    @property
+    def token_limit(self) -> int:
+        override = api_settings.openai_section_overrides.get(self.name, {})
+        return int(override.get("max_output_tokens") or self.max_output_tokens)
+
+
+_SECTIONS = (
+    AuditSection(
+        name="resumo",
+        fields=("nome_completo", "instagram", "nicho_principal", "resumo_executivo"),
+        instructions="Raio-X do perfil e resumo executivo.",
+        max_output_tokens=400,
+    ),
+    AuditSection(
+        name="numeros",
+        fields=(
+            "ticket_medio", "leads_estimados", "faturamento_potencial",
+            "meta_seguidores", "leads_atuais", "meta_leads", "meta_faturamento",
+        ),
+        instructions=(
+            "Valor de mercado e projeção de crescimento. "
+            "Valores curtos e formatados (ex: R$ 500,00 ou 50k), coerentes entre si."
+        ),
+        max_output_tokens=400,
+    ),
+    AuditSection(
+        name="mercado",
+        fields=("tamanho_mercado_html", "audiencia_html"),
+        instructions="Tamanho do mercado e audiência visível vs oculta.",
+        max_output_tokens=1500,
+    ),
+    AuditSection(
+        name="diagnostico",
+        fields=("diagnostico_html", "erros_html"),
+        instructions="Diagnóstico de crescimento e os três principais erros personalizados.",
+        max_output_tokens=1500,
+    ),
+    AuditSection(
+        name="estrategia",
+        fields=("oportunidade_html", "plano_detalhado_html"),
+        instructions="Oportunidade principal e plano de autoridade de 60 a 120 dias.",
+        max_output_tokens=2500,
+    ),
+    AuditSection(
+        name="viralizacao",
+        fields=(VIRALIZATION_FIELD,),
+        instructions=(
+            "Chance de viralização (de 0 a 60%) baseada APENAS nas respostas do formulário "
+            "e o que a pessoa precisa fazer para viralizar de forma estruturada e escalável. "
+            "Exemplo: Sua taxa de viralização é entre 30% a 60% por causa de..."
+        ),
+        max_output_tokens=800,
+    ),
+    AuditSection(
+        name="conclusao",
+        fields=("conclusao_html",),
+        instructions="Conclusão estratégica elaborada e técnica, com pelo menos 10 linhas.",
+        max_output_tokens=1500,
+    ),
+)
+
+
+def _with_leftovers(sections: Tuple[AuditSection, ...]) -> Tuple[AuditSection, ...]:
+    # Placeholders novos no template que nenhuma seção cobre vão para uma seção extra
+    covered = {field for section in sections for field in section.fields}
+    leftovers = tuple(f for f in AUDIT_TEMPLATE.generated_fields if f not in covered)
+    if not leftovers:
+        return sections
+    return sections + (
+        AuditSection(
+            name="outros",
+            fields=leftovers,
+            instructions="Demais campos da auditoria.",
+            max_output_tokens=1500,
+        ),
+    )
+
+
+AUDIT_SECTIONS = _with_leftovers(_SECTIONS)
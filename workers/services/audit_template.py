@@ -0,0 +1,54 @@
+"""
+Local fill of assets/auditoria_template.html.
+
+The template is split once, at import time, into literal chunks and
+placeholder names, so filling it is a single join. Placeholders ending in
+"_html" are inserted as-is; every other value is HTML-escaped.
+"""
+import html
+import re
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from workers.services.pdf import LOGO_URL
+
+
+TEMPLATE_PATH = Path(__file__).resolve().parents[2] / "assets" / "auditoria_template.html"
+PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+
+# Preenchidos localmente, nunca pelo modelo
+LOCAL_FIELDS = {"logo_url": LOGO_URL}
+
+
+class AuditTemplate:
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self._chunks: List[str] = []
+        self._slots: List[Tuple[str, bool]] = []
+
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            self._chunks.append(source[position:match.start()])
+            name = match.group(1)
+            self._slots.append((name, name.endswith("_html")))
+            position = match.end()
+        self._chunks.append(source[position:])
+
+        self.fields: List[str] = list(dict.fromkeys(name for name, _ in self._slots))
+
+    @property
+    def generated_fields(self) -> List[str]:
+        """Placeholders the LLM has to fill."""
+        return [name for name in self.fields if name not in LOCAL_FIELDS]
+
+    def render(self, values: Dict[str, str]) -> str:
+        values = {**values, **LOCAL_FIELDS}
+        parts = [self._chunks[0]]
+        for (name, is_html), chunk in zip(self._slots, self._chunks[1:]):
+            value = str(values.get(name, ""))
+            parts.append(value if is_html or name in LOCAL_FIELDS else html.escape(value))
+            parts.append(chunk)
+        return "".join(parts)
+
+
+AUDIT_TEMPLATE = AuditTemplate(TEMPLATE_PATH.read_text(encoding="utf-8"))
@@ -1,9 +1,19 @@
-import requests
+from functools import lru_cache
 from typing import Any, Dict, Optional
+
+import httpx
+import redis
+
 from api.settings import api_settings
+from api.utils import normalize_phone
+from workers.services import http
+from workers.services.redis_client import get_redis
 
 BOTCONVERSA_BASE_URL = "https://backend.botconversa.com.br/api/v1/webhook"
+PROVIDER = "botconversa"  # rate limit / circuit breaker (provider_guard)
+SUBSCRIBER_CACHE_PREFIX = "botconversa:subscriber:"
 
+@lru_cache(maxsize=1)
 def get_headers() -> Dict[str, str]:
     if not api_settings.botconversa_api_key:
         raise ValueError("BOTCONVERSA_API_KEY not configured")
@@ -12,21 +22,40 @@ def get_headers() -> Dict[str, str]:
         "Content-Type": "application/json"
     }
 
+def get_cached_subscriber_id(phone: str) -> Optional[int]:
+    try:
+        value = get_redis().get(SUBSCRIBER_CACHE_PREFIX + normalize_phone(phone))
+    except redis.RedisError as e:
+        print(f"BOTCONVERSA CACHE ERROR: {e}")
+        return None
+    return int(value) if value else None
+
+def cache_subscriber_id(phone: str, subscriber_id: int) -> None:
+    try:
+        get_redis().set(
+            SUBSCRIBER_CACHE_PREFIX + normalize_phone(phone),
+            subscriber_id,
+            ex=api_settings.botconversa_subscriber_cache_ttl,
+        )
+    except redis.RedisError as e:
+        print(f"BOTCONVERSA CACHE ERROR: {e}")
+
+def invalidate_subscriber_id(phone: str) -> None:
+    try:
+        get_redis().delete(SUBSCRIBER_CACHE_PREFIX + normalize_phone(phone))
+    except redis.RedisError as e:
+        print(f"BOTCONVERSA CACHE ERROR: {e}")
+
 def get_subscriber_by_phone(phone: str) -> Optional[Dict[str, Any]]:
     """
     Find subscriber by phone number.
     Returns Subscriber object if found, else None.
     """
-    import re
-    clean_phone = re.sub(r'\D', '', str(phone))
-    
-    # Se o número tiver 10 ou 11 dígitos (DD + número), adicionamos o 55 (Brasil)
-    if len(clean_phone) in [10, 11] and not clean_phone.startswith('55'):
-        clean_phone = '55' + clean_phone
+    clean_phone = normalize_phone(phone)
     
-    url = f"{BOTCONVERSA_BASE_URL}/subscriber/get_by_phone/{clean_phone}/"
+    path = f"/subscriber/get_by_phone/{clean_phone}/"
     
-    response = requests.get(url, headers=get_headers(), timeout=10)
+    response = http.request(BOTCONVERSA_BASE_URL, "GET", path, headers=get_headers(), provider=PROVIDER)
     
     if response.status_code == 404:
         return None
@@ -38,14 +67,8 @@ def create_subscriber(phone: str, first_name: str, last_name: str = "") -> Dict[
     """
     Create a new subscriber in BotConversa.
     """
-    import re
-    clean_phone = re.sub(r'\D', '', str(phone))
-    
-    # Garante o prefixo 55 se for um número brasileiro sem prefixo
-    if len(clean_phone) in [10, 11] and not clean_phone.startswith('55'):
-        clean_phone = '55' + clean_phone
+    clean_phone = normalize_phone(phone)
     
-    url = f"{BOTCONVERSA_BASE_URL}/subscriber/"
     payload = {
         "phone": clean_phone,
         "first_name": first_name or "Cliente",
@@ -55,9 +78,9 @@ def create_subscriber(phone: str, first_name: str, last_name: str = "") -> Dict[
     
     print(f"BOTCONVERSA: Tentando criar assinante com payload: {payload}")
     
-    response = requests.post(url, json=payload, headers=get_headers(), timeout=10)
+    response = http.request(BOTCONVERSA_BASE_URL, "POST", "/subscriber/", json=payload, headers=get_headers(), provider=PROVIDER)
     
-    if not response.ok:
+    if not response.is_success:
         print(f"BOTCONVERSA CREATE ERROR: {response.status_code} - {response.text}")
         response.raise_for_status()
         
@@ -67,19 +90,19 @@ def send_whatsapp_message(subscriber_id: int, message: str) -> Dict[str, Any]:
     """
     Send a WhatsApp message to a subscriber.
     """
-    url = f"{BOTCONVERSA_BASE_URL}/subscriber/{subscriber_id}/send_message/"
+    path = f"/subscriber/{subscriber_id}/send_message/"
     payload = {
         "type": "text",
         "value": message
     }
     
-    response = requests.post(url, json=payload, headers=get_headers(), timeout=10)
+    response = http.request(BOTCONVERSA_BASE_URL, "POST", path, json=payload, headers=get_headers(), provider=PROVIDER)
     response.raise_for_status()
     return response.json()
 
-def ensure_subscriber_and_send_message(phone: str, first_name: str, message: str) -> Dict[str, Any]:
+def resolve_subscriber_id(phone: str, first_name: str) -> int:
     """
-    Ensures subscriber exists (gets ID) and then sends message.
+    Finds (or creates) the subscriber for this phone and caches its ID.
     """
     # 1) Search
     subscriber = get_subscriber_by_phone(phone)
@@ -91,6 +114,28 @@ def ensure_subscriber_and_send_message(phone: str, first_name: str, message: str
     subscriber_id = subscriber.get("id")
     if not subscriber_id:
         raise ValueError(f"Failed to get subscriber ID for phone {phone}")
-        
+
+    cache_subscriber_id(phone, subscriber_id)
+    return subscriber_id
+
+def ensure_subscriber_and_send_message(phone: str, first_name: str, message: str) -> Dict[str, Any]:
+    """
+    Ensures subscriber exists (gets ID) and then sends message.
+    The subscriber ID comes from the phone cache when possible, so most
+    sends are a single API call.
+    """
+    subscriber_id = get_cached_subscriber_id(phone)
+    if subscriber_id:
+        try:
+            return send_whatsapp_message(subscriber_id, message)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                raise
+            # Assinante removido no BotConversa: descarta o cache e busca de novo
+            print(f"BOTCONVERSA: assinante {subscriber_id} não encontrado, atualizando cache")
+            invalidate_subscriber_id(phone)
+
+    subscriber_id = resolve_subscriber_id(phone, first_name)
+
     # 3) Send Message
     return send_whatsapp_message(subscriber_id, message)
@@ -0,0 +1,60 @@
+"""
+Charge status updates over Redis.
+
+Writers (checkout fast path, create_woovi_charge_task, woovi_webhook) call
+publish_charge after committing: it rewrites the cached ChargeResponse read
+by GET /api/checkout/{id} and publishes it on the charge channel, which
+GET /api/checkout/{id}/events relays to the payment page as Server-Sent Events.
+"""
+from typing import Any, Optional
+
+import redis
+
+from api.schemas import ChargeResponse
+from api.settings import api_settings
+from workers.services.redis_client import get_redis
+
+
+CHANNEL_PREFIX = "charge:events:"
+CACHE_PREFIX = "charge:response:"
+
+
+def charge_channel(charge_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{charge_id}"
+
+
+def serialize_charge(charge: Any) -> str:
+    return ChargeResponse.model_validate(charge, from_attributes=True).model_dump_json()
+
+
+def get_cached_charge(charge_id: int) -> Optional[str]:
+    if api_settings.checkout_cache_ttl <= 0:
+        return None
+    try:
+        return get_redis().get(f"{CACHE_PREFIX}{charge_id}")
+    except redis.RedisError as e:
+        print(f"CHARGE CACHE ERROR: {e}")
+        return None
+
+
+def cache_charge(charge_id: int, body: str) -> None:
+    """Fills the cache after a miss. NX: never overwrites a newer state written by publish_charge."""
+    if api_settings.checkout_cache_ttl <= 0:
+        return
+    try:
+        get_redis().set(f"{CACHE_PREFIX}{charge_id}", body, ex=api_settings.checkout_cache_ttl, nx=True)
+    except redis.RedisError as e:
+        print(f"CHARGE CACHE ERROR: {e}")
+
+
+def publish_charge(charge: Any) -> None:
+    """Rewrites the cache and publishes the current state of a committed charge (best effort)."""
+    body = serialize_charge(charge)
+    try:
+        with get_redis().pipeline(transaction=False) as pipe:
+            if api_settings.checkout_cache_ttl > 0:
+                pipe.set(f"{CACHE_PREFIX}{charge.id}", body, ex=api_settings.checkout_cache_ttl)
+            pipe.publish(charge_channel(charge.id), body)
+            pipe.execute()
+    except redis.RedisError as e:
+        print(f"CHARGE EVENTS ERROR: {e}")
@@ -1,25 +1,116 @@
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import BinaryIO, Optional, Union
 
 import base64
 import binascii
+import io
 import json
+import threading
 
+from google.auth.transport.requests import Request
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import MediaIoBaseUpload
 
 from api.settings import api_settings
 
 
 SCOPES = ["https://www.googleapis.com/auth/drive.file"]
 
+# Renova o token de acesso antes de expirar
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
 
-def upload_file(file_path: Path, filename: str, folder_id: str, mimetype: str = "text/csv") -> dict:
+_credentials: Optional[service_account.Credentials] = None
+_credentials_lock = threading.Lock()
+_discovery_doc: Optional[str] = None
+# O cliente httplib2 do googleapiclient não é thread-safe: um service por thread
+_local = threading.local()
+
+
+def _load_credentials() -> service_account.Credentials:
+    if not api_settings.google_service_account_json_base64:
+        raise RuntimeError(
+            "Google Drive credentials missing. "
+            "Set GOOGLE_SERVICE_ACCOUNT_JSON_BASE64."
+        )
+    try:
+        decoded = base64.b64decode(
+            api_settings.google_service_account_json_base64
+        ).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise RuntimeError(
+            "GOOGLE_SERVICE_ACCOUNT_JSON_BASE64 invalido (base64)."
+        ) from exc
+    try:
+        info = json.loads(decoded)
+    except json.JSONDecodeError as exc:
+        raise RuntimeError(
+            "GOOGLE_SERVICE_ACCOUNT_JSON_BASE64 invalido (JSON)."
+        ) from exc
+    return service_account.Credentials.from_service_account_info(
+        info, scopes=SCOPES
+    )
+
+
+def get_credentials() -> service_account.Credentials:
+    """
+    Process-wide service account credentials, parsed once and refreshed
+    ahead of expiry so concurrent uploads never race on a token refresh.
+    """
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = _load_credentials()
+        expiry = _credentials.expiry
+        # expiry é um datetime UTC sem timezone
+        if expiry is not None:
+            expiry = expiry.replace(tzinfo=timezone.utc)
+        if (
+            not _credentials.valid
+            or expiry is None
+            or expiry - datetime.now(timezone.utc) < TOKEN_REFRESH_MARGIN
+        ):
+            _credentials.refresh(Request())
+        return _credentials
+
+
+def _get_discovery_doc() -> str:
+    global _discovery_doc
+    if _discovery_doc is None:
+        _discovery_doc = get_static_doc("drive", "v3")
+    return _discovery_doc
+
+
+def warm_drive() -> None:
+    """
+    Loads the credentials (with a fresh token) and the discovery document.
+    The service itself is per thread, so it is built by each actor thread
+    on its first upload.
+    """
+    get_credentials()
+    _get_discovery_doc()
+
+
+def get_drive_service():
+    """Drive service for the current thread, built from the cached discovery document."""
+    credentials = get_credentials()
+    service = getattr(_local, "service", None)
+    if service is None:
+        service = build_from_document(_get_discovery_doc(), credentials=credentials)
+        _local.service = service
+    return service
+
+
+def upload_file(
+    file: Union[Path, BinaryIO], filename: str, folder_id: str, mimetype: str = "text/csv"
+) -> dict:
     """
     Generic file upload to Google Drive.
     
     Args:
-        file_path: Path to the file to upload
+        file: Path to the file to upload, or a binary stream (e.g. io.BytesIO)
         filename: Name for the file in Drive
         folder_id: Google Drive folder ID
         mimetype: MIME type of the file
@@ -27,37 +118,20 @@ def upload_file(file_path: Path, filename: str, folder_id: str, mimetype: str =
     Returns:
         Dict with file id and webViewLink
     """
-    credentials = None
-    if api_settings.google_service_account_json_base64:
-        try:
-            decoded = base64.b64decode(
-                api_settings.google_service_account_json_base64
-            ).decode("utf-8")
-        except (binascii.Error, UnicodeDecodeError) as exc:
-            raise RuntimeError(
-                "GOOGLE_SERVICE_ACCOUNT_JSON_BASE64 invalido (base64)."
-            ) from exc
-        try:
-            info = json.loads(decoded)
-        except json.JSONDecodeError as exc:
-            raise RuntimeError(
-                "GOOGLE_SERVICE_ACCOUNT_JSON_BASE64 invalido (JSON)."
-            ) from exc
-        credentials = service_account.Credentials.from_service_account_info(
-            info, scopes=SCOPES
-        )
-    else:
-        raise RuntimeError(
-            "Google Drive credentials missing. "
-            "Set GOOGLE_SERVICE_ACCOUNT_JSON_BASE64."
-        )
-    service = build("drive", "v3", credentials=credentials)
+    if isinstance(file, Path):
+        with file.open("rb") as stream:
+            return _upload_stream(stream, filename, folder_id, mimetype)
+    return _upload_stream(file, filename, folder_id, mimetype)
+
+
+def _upload_stream(stream: BinaryIO, filename: str, folder_id: str, mimetype: str) -> dict:
+    service = get_drive_service()
 
     file_metadata = {
         "name": filename,
         "parents": [folder_id],
     }
-    media = MediaFileUpload(str(file_path), mimetype=mimetype)
+    media = MediaIoBaseUpload(stream, mimetype=mimetype, resumable=True)
 
     return (
         service.files()
@@ -71,10 +145,10 @@ def upload_file(file_path: Path, filename: str, folder_id: str, mimetype: str =
     )
 
 
-def upload_pdf(file_path: Path, filename: str) -> dict:
-    """Upload PDF to default Google Drive folder"""
+def upload_pdf(pdf: bytes, filename: str) -> dict:
+    """Upload in-memory PDF bytes to default Google Drive folder"""
     return upload_file(
-        file_path=file_path,
+        file=io.BytesIO(pdf),
         filename=filename,
         folder_id=api_settings.google_drive_folder_id,
         mimetype="application/pdf"
@@ -0,0 +1,171 @@
+"""
+Shared HTTP clients for the Woovi, BotConversa and Ploomes integrations.
+
+One httpx.Client per base URL and process keeps connections alive between
+calls (HTTP/2 when the server negotiates it), with separate connect and read
+timeouts. Idempotent requests are retried with exponential backoff on
+connection errors and 429/5xx responses. Redirects are followed, as they
+were with requests, and error responses raise httpx.HTTPStatusError from
+raise_for_status(). Every request is counted as a pool
+hit (reused connection) or miss (new TCP/TLS handshake) per host.
+
+Requests tagged with a `provider` go through its rate limiter and circuit
+breaker (workers/services/provider_guard.py).
+"""
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Collection, Dict, Optional
+
+import httpx
+
+from api.settings import api_settings
+from workers.services import provider_guard
+
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+_clients: Dict[str, httpx.Client] = {}
+_clients_lock = threading.Lock()
+
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "retries": 0})
+_stats_lock = threading.Lock()
+
+
+def get_client(base_url: str) -> httpx.Client:
+    """Returns the pooled client for `base_url`, creating it on first use."""
+    client = _clients.get(base_url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(base_url)
+            if client is None:
+                client = httpx.Client(
+                    base_url=base_url,
+                    http2=api_settings.http_http2,
+                    # requests seguia redirects por padrão; httpx não
+                    follow_redirects=True,
+                    timeout=httpx.Timeout(
+                        api_settings.http_read_timeout,
+                        connect=api_settings.http_connect_timeout,
+                    ),
+                    limits=httpx.Limits(
+                        max_connections=api_settings.http_max_connections,
+                        max_keepalive_connections=api_settings.http_max_keepalive_connections,
+                    ),
+                )
+                _clients[base_url] = client
+    return client
+
+
+def _count(host: str, key: str) -> None:
+    with _stats_lock:
+        _stats[host][key] += 1
+
+
+def _remaining(deadline: float) -> float:
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise httpx.TimeoutException("request deadline exceeded")
+    return left
+
+
+def request(
+    base_url: str,
+    method: str,
+    path: str,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+    retries: Optional[int] = None,
+    provider: Optional[str] = None,
+    deadline: Optional[float] = None,
+    expected_status: Collection[int] = (),
+    **kwargs: Any,
+) -> httpx.Response:
+    """
+    Sends a request on the shared client of `base_url`.
+    Non-idempotent methods (POST, PATCH) are never retried unless `retries` is given.
+    With `provider`, raises provider_guard.ProviderUnavailable instead of
+    calling a provider that is rate limited or has its circuit open.
+    `deadline` (time.monotonic() value) bounds the whole call: the rate limiter
+    wait, every httpx phase (pool, connect, write, read) and the retries only
+    get the time left, and httpx.TimeoutException is raised once it passes.
+    Statuses in `expected_status` are answers the caller handles (e.g. a
+    feature probe) and count as a success for the circuit breaker.
+    """
+    method = method.upper()
+    if retries is None:
+        retries = api_settings.http_max_retries if method in IDEMPOTENT_METHODS else 0
+
+    client = get_client(base_url)
+    host = client.base_url.host
+    attempt = 0
+    while True:
+        connected = []
+        timeouts: Dict[str, float] = {}
+
+        def trace(event_name: str, info: Dict[str, Any]) -> None:
+            # httpcore só abre TCP quando não há conexão ociosa no pool
+            if event_name == "connection.connect_tcp.started":
+                connected.append(True)
+            # O httpcore lê o timeout de cada fase quando ela começa: cada uma
+            # recebe só o que sobra do prazo, não o prazo inteiro de novo
+            if deadline is not None and event_name.endswith(".started"):
+                timeouts.update(dict.fromkeys(timeouts, max(deadline - time.monotonic(), 0.001)))
+
+        if provider:
+            provider_guard.before_call(
+                provider, max_wait=_remaining(deadline) if deadline is not None else None
+            )
+
+        extensions: Dict[str, Any] = {"trace": trace}
+        if deadline is not None:
+            timeouts.update(dict.fromkeys(("connect", "read", "write", "pool"), _remaining(deadline)))
+            extensions["timeout"] = timeouts
+        try:
+            response = client.request(
+                method, path, headers=headers, extensions=extensions, **kwargs
+            )
+        except httpx.TransportError:
+            _count(host, "misses" if connected else "hits")
+            if provider:
+                provider_guard.record_failure(provider)
+            if attempt >= retries:
+                raise
+            response = None
+        else:
+            _count(host, "misses" if connected else "hits")
+            if provider:
+                if response.status_code in expected_status:
+                    provider_guard.record_success(provider)
+                elif response.status_code == 429 or response.status_code >= 500:
+                    provider_guard.record_failure(provider)
+                else:
+                    provider_guard.record_success(provider)
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                return response
+
+        attempt += 1
+        delay = api_settings.http_retry_backoff * (2 ** (attempt - 1))
+        delay += random.uniform(0, delay / 2)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            # Sem tempo para outra tentativa: devolve a última resposta (ou o erro)
+            if response is not None:
+                return response
+            raise httpx.TimeoutException("request deadline exceeded")
+        _count(host, "retries")
+        time.sleep(delay)
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """Pool hit/miss and retry counters per host, for this process."""
+    with _stats_lock:
+        return {host: dict(counters) for host, counters in _stats.items()}
+
+
+def close_clients() -> None:
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
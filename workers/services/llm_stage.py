@@ -0,0 +1,117 @@
+"""
+Asyncio-based LLM stage.
+
+One event loop per worker process, running in a background thread, holds
+up to OPENAI_MAX_IN_FLIGHT OpenAI requests at once on a shared AsyncOpenAI
+client. The limit counts requests, not jobs: a job in sections mode takes
+one slot per section request. Dramatiq threads only submit work and return,
+so LLM concurrency is no longer capped by threads x processes.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from openai import AsyncOpenAI
+
+from api.settings import api_settings
+
+
+class _BoundedResponses:
+    """`client.responses` with every create() holding one slot of the stage semaphore."""
+
+    def __init__(self, stage: "LLMStage", responses) -> None:
+        self._stage = stage
+        self._responses = responses
+
+    async def create(self, **kwargs: Any) -> Any:
+        async with self._stage._semaphore:
+            self._stage._in_flight += 1
+            try:
+                return await self._responses.create(**kwargs)
+            finally:
+                self._stage._in_flight -= 1
+
+
+class _BoundedClient:
+    """What the submitted factories receive: the shared client behind the request limit."""
+
+    def __init__(self, stage: "LLMStage", client: AsyncOpenAI) -> None:
+        self.responses = _BoundedResponses(stage, client.responses)
+
+
+class LLMStage:
+    def __init__(self, max_in_flight: int) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="llm-stage-loop", daemon=True)
+        self._ready = threading.Event()
+        self._max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        # Criados dentro do loop: o cliente httpx e o semáforo ficam presos a ele
+        self.client = AsyncOpenAI(api_key=api_settings.openai_api_key)
+        self._semaphore = asyncio.Semaphore(self._max_in_flight)
+        self._bounded_client = _BoundedClient(self, self.client)
+        self._ready.set()
+        self._loop.run_forever()
+
+    @property
+    def in_flight(self) -> int:
+        """OpenAI requests currently holding a slot."""
+        return self._in_flight
+
+    async def _run_factory(self, factory: Callable[[AsyncOpenAI], Awaitable[Any]]) -> Any:
+        return await factory(self._bounded_client)
+
+    def submit(self, factory: Callable[[AsyncOpenAI], Awaitable[Any]]) -> Future:
+        """
+        Schedules `factory(client)` on the loop. Each `client.responses.create`
+        made by the factory waits for a slot of the semaphore.
+        Safe to call from any thread; returns a concurrent Future.
+        """
+        return asyncio.run_coroutine_threadsafe(self._run_factory(factory), self._loop)
+
+    def generate_html(self, payload: Dict[str, Any]) -> Future:
+        from workers.services.openai_client import generate_html_async
+
+        return self.submit(lambda client: generate_html_async(payload, client))
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Waits for in-flight generations (up to timeout) and stops the loop."""
+
+        async def _drain() -> None:
+            pending = [
+                task for task in asyncio.all_tasks(self._loop)
+                if task is not asyncio.current_task()
+            ]
+            if pending:
+                await asyncio.wait(pending, timeout=timeout)
+            await self.client.close()
+
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(_drain(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+
+_stage: Optional[LLMStage] = None
+_stage_lock = threading.Lock()
+
+
+def get_llm_stage() -> LLMStage:
+    """Returns the LLM stage of this worker process, starting its loop on first use."""
+    global _stage
+    if _stage is None:
+        with _stage_lock:
+            if _stage is None:
+                _stage = LLMStage(max_in_flight=api_settings.openai_max_in_flight)
+    return _stage
+
+
+def close_llm_stage(timeout: Optional[float] = None) -> None:
+    if _stage is not None:
+        _stage.close(timeout=timeout)
@@ -0,0 +1,58 @@
+import hashlib
+import time
+from pathlib import Path
+from typing import Optional
+
+
+def cleanup_directory(directory: Path, max_bytes: int, max_age_seconds: int) -> int:
+    """
+    Removes files older than max_age_seconds, then the oldest files until the
+    directory is under max_bytes. Returns how many files were removed.
+    """
+    if not directory.exists():
+        return 0
+
+    now = time.time()
+    files = []
+    removed = 0
+    for path in directory.iterdir():
+        if not path.is_file():
+            continue
+        stat = path.stat()
+        if now - stat.st_mtime > max_age_seconds:
+            path.unlink(missing_ok=True)
+            removed += 1
+        else:
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+
+    return removed
+
+
+def save_local_copy(
+    directory: Path, data: bytes, filename: str, max_bytes: int, max_age_seconds: int
+) -> Path:
+    """Writes data into directory and prunes it by size and age."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / filename
+    path.write_bytes(data)
+    cleanup_directory(directory, max_bytes=max_bytes, max_age_seconds=max_age_seconds)
+    return path
+
+
+def read_local_copy(directory: Path, filename: str, sha256: str) -> Optional[bytes]:
+    """Returns the stored file only if it still exists and matches the hash."""
+    path = directory / filename
+    if not path.is_file():
+        return None
+    data = path.read_bytes()
+    if hashlib.sha256(data).hexdigest() != sha256:
+        return None
+    return data
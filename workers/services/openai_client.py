@@ -1,22 +1,39 @@
+import asyncio
+import json
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from api.settings import api_settings
+from workers.services.audit_sections import AUDIT_SECTIONS, VIRALIZATION_FIELD, AuditSection
+from workers.services.audit_template import AUDIT_TEMPLATE
+from workers.services.pdf import LOGO_URL
 
 
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OpenAI:
+    """Process-wide OpenAI client (thread-safe, reuses its connection pool)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(api_key=api_settings.openai_api_key)
+    return _client
+
+
+@lru_cache(maxsize=1)
 def _load_assets() -> Dict[str, str]:
+    # CSS e logo não são mais embutidos no HTML: o RenderContext
+    # (workers/services/pdf.py) aplica o auditoria.css e serve o logo.
     assets_path = Path(__file__).resolve().parents[2] / "assets"
-    import base64
-    logo_path = assets_path / "logo.svg"
-    logo_base64 = base64.b64encode(logo_path.read_bytes()).decode("utf-8")
-    logo_data_uri = f"data:image/svg+xml;base64,{logo_base64}"
-    
     return {
         "template": (assets_path / "auditoria_template.html").read_text(encoding="utf-8"),
-        "css": (assets_path / "auditoria.css").read_text(encoding="utf-8"),
-        "logo_uri": logo_data_uri
     }
 
 
@@ -44,23 +61,29 @@ QUESTION_MAP = {
 }
 
 
-def generate_html(payload: Dict[str, Any]) -> str:
-    client = OpenAI(api_key=api_settings.openai_api_key)
-    assets = _load_assets()
+SYSTEM_PROMPT_BASE = (
+    "Você é um especialista sênior em marketing digital, branding e estratégia de autoridade. "
+    "Sua missão é transformar dados brutos de um formulário em uma Auditoria Estratégica Premium. "
+    "O texto deve ser persuasivo, autoritário, mas ao mesmo tempo acolhedor e altamente estratégico. "
+    "Inspire-se em auditorias de alto nível: use termos como 'Alavancagem de Autoridade', 'Escalabilidade Digital', 'Público Qualificado' e 'Lacunas de Conversão'. "
+)
+
+VIRALIZATION_PROMPT = (
+    "Adicione ao texto final quantos % (de 0 a 60%) qual é chance que pessoa tem de viralizar para atingir os resultados desejados baseado APENAS nas respostas do formulário. E o que ela precisa fazer para começar a viralizar de uma forma estruturada e escalável."
+    "Importante: queremos uma margem de melhora, ou seja, apenas de 0 à 60% apenas, exemplo: Sua taxa de viralização é entre 30% a 60% por causa de..."
+    "Enriqueça o texto com insights estratégicos baseados nos dados fornecidos. E uma conclusão elaborada e técnica com pelo menos 10 linhas."
+)
+
+FILLING_RULES = (
+    "2. {{nome_completo}}, {{instagram}} e {{nicho_principal}} devem ser extraídos fielmente dos dados.\n"
+    "3. {{resumo_executivo}} deve ser um texto curto (2-3 linhas) impactante sobre o momento atual do cliente.\n"
+    "4. {{ticket_medio}}, {{meta_seguidores}}, etc, devem ser formatados de forma bonita (ex: R$ 500,00 ou 50k).\n"
+    "5. Os campos terminados em '_html' devem conter uma estrutura estratégica rica (use <p>, <ul>, <li>, <strong>).\n"
+    "6. O tone deve ser de um consultor premium que realmente analisou os dados e está dando o caminho das pedras.\n"
+)
 
-    system_prompt = (
-        "Você é um especialista sênior em marketing digital, branding e estratégia de autoridade. "
-        "Sua missão é transformar dados brutos de um formulário em uma Auditoria Estratégica Premium. "
-        "O texto deve ser persuasivo, autoritário, mas ao mesmo tempo acolhedor e altamente estratégico. "
-        "Inspire-se em auditorias de alto nível: use termos como 'Alavancagem de Autoridade', 'Escalabilidade Digital', 'Público Qualificado' e 'Lacunas de Conversão'. "
-        "IMPORTANTE: Você deve retornar APENAS o código HTML preenchido. "
-        "Adicione ao texto final quantos % (de 0 a 60%) qual é chance que pessoa tem de viralizar para atingir os resultados desejados baseado APENAS nas respostas do formulário. E o que ela precisa fazer para começar a viralizar de uma forma estruturada e escalável."
-        "Importante: queremos uma margem de melhora, ou seja, apenas de 0 à 60% apenas, exemplo: Sua taxa de viralização é entre 30% a 60% por causa de..."
-        "Enriqueça o texto com insights estratégicos baseados nos dados fornecidos. E uma conclusão elaborada e técnica com pelo menos 10 linhas."
-        "MANTENHA EXATAMENTE as classes CSS e a estrutura do template fornecido. "
-        "Não use blocos de Markdown como ```html ... ```. Retorne o texto puro do HTML.."
-    )
 
+def _map_form_data(payload: Dict[str, Any]) -> Dict[str, Any]:
     # Map IDs to questions
     raw_data = payload.get("data", {}).get("data", {})
     
@@ -68,44 +91,154 @@ def generate_html(payload: Dict[str, Any]) -> str:
     if "instagram" in raw_data and isinstance(raw_data["instagram"], str):
         raw_data["instagram"] = raw_data["instagram"].strip().lstrip("@").strip()
 
-    mapped_data = {QUESTION_MAP.get(k, k): v for k, v in raw_data.items()}
+    return {QUESTION_MAP.get(k, k): v for k, v in raw_data.items()}
+
+
+def _response_text(response: Any) -> str:
+    # Pegamos o texto gerado da estrutura de Responses
+    text = ""
+    if hasattr(response, "output_text"):
+        text = response.output_text.strip()
+    
+    if not text:
+        # Fallback para percorrer a lista de output caso output_text não esteja disponível
+        for item in response.output or []:
+            for content in item.content or []:
+                if getattr(content, "text", None):
+                    text = content.text.strip()
+                    break
+            if text:
+                break
+    return text
+
+
+def fields_schema(fields: List[str]) -> Dict[str, Any]:
+    """Strict JSON schema: one string property per template placeholder."""
+    return {
+        "type": "object",
+        "properties": {field: {"type": "string"} for field in fields},
+        "required": list(fields),
+        "additionalProperties": False,
+    }
+
+
+def _fields_request(mapped_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Asks only for the placeholder values, as a schema-constrained JSON object."""
+    system_prompt = (
+        SYSTEM_PROMPT_BASE
+        + "IMPORTANTE: Você deve retornar APENAS os valores dos campos da auditoria, no JSON solicitado. "
+        + "No campo conclusao_html: " + VIRALIZATION_PROMPT
+    )
+    user_prompt = (
+        f"Dados do cliente capturados no formulário:\n{mapped_data}\n\n"
+        f"Campos a preencher: {', '.join(AUDIT_TEMPLATE.generated_fields)}.\n\n"
+        "Instruções cruciais de preenchimento:\n"
+        "1. Cada campo recebe apenas o seu conteúdo, sem repetir títulos de seção.\n"
+        + FILLING_RULES
+        + "7. Campos que não terminam em '_html' são texto puro, sem tags.\n"
+        "8. Não use placeholders ou textos genéricos. Gere insights reais baseados no nicho e público informado."
+    )
+
+    return {
+        "model": api_settings.openai_model,
+        "input": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": "auditoria",
+                "schema": fields_schema(AUDIT_TEMPLATE.generated_fields),
+                "strict": True,
+            }
+        },
+    }
+
+
+def _html_request(mapped_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Legacy mode: the model copies the whole template and returns filled HTML."""
+    assets = _load_assets()
+
+    system_prompt = (
+        SYSTEM_PROMPT_BASE
+        + "IMPORTANTE: Você deve retornar APENAS o código HTML preenchido. "
+        + VIRALIZATION_PROMPT
+        + "MANTENHA EXATAMENTE as classes CSS e a estrutura do template fornecido. "
+        "Não use blocos de Markdown como ```html ... ```. Retorne o texto puro do HTML.."
+    )
     user_prompt = (
         f"Dados do cliente capturados no formulário:\n{mapped_data}\n\n"
         f"Use este Template HTML para preencher as informações:\n{assets['template']}\n\n"
         "Instruções cruciais de preenchimento:\n"
         "1. Substitua os placeholders {{field}} pelo conteúdo gerado.\n"
-        "2. {{nome_completo}}, {{instagram}} e {{nicho_principal}} devem ser extraídos fielmente dos dados.\n"
-        "3. {{resumo_executivo}} deve ser um texto curto (2-3 linhas) impactante sobre o momento atual do cliente.\n"
-        "4. {{ticket_medio}}, {{meta_seguidores}}, etc, devem ser formatados de forma bonita (ex: R$ 500,00 ou 50k).\n"
-        "5. Os campos terminados em '_html' devem conter uma estrutura estratégica rica (use <p>, <ul>, <li>, <strong>).\n"
-        "6. O tone deve ser de um consultor premium que realmente analisou os dados e está dando o caminho das pedras.\n"
-        "7. Não substitua o placeholder {{logo_url}}, deixe-o exatamente como está.\n"
+        + FILLING_RULES
+        + "7. Não substitua o placeholder {{logo_url}}, deixe-o exatamente como está.\n"
         "8. Não use placeholders ou textos genéricos. Gere insights reais baseados no nicho e público informado."
     )
 
-    response = client.responses.create(
-        model=api_settings.openai_model,
-        input=[
+    return {
+        "model": api_settings.openai_model,
+        "input": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
+    }
+
+
+def _section_request(section: AuditSection, mapped_data: Dict[str, Any]) -> Dict[str, Any]:
+    """One section of the audit; the shared prefix is identical across sections."""
+    system_prompt = (
+        SYSTEM_PROMPT_BASE
+        + "IMPORTANTE: Você deve retornar APENAS os valores dos campos pedidos, no JSON solicitado. "
+        + "Outras seções da auditoria são escritas em paralelo: não repita o conteúdo delas."
+    )
+    user_prompt = (
+        f"Dados do cliente capturados no formulário:\n{mapped_data}\n\n"
+        "Instruções cruciais de preenchimento:\n"
+        "1. Cada campo recebe apenas o seu conteúdo, sem repetir títulos de seção.\n"
+        + FILLING_RULES
+        + "7. Campos que não terminam em '_html' são texto puro, sem tags.\n"
+        "8. Não use placeholders ou textos genéricos. Gere insights reais baseados no nicho e público informado.\n\n"
+        f"Seção: {section.instructions}\n"
+        f"Campos a preencher: {', '.join(section.fields)}."
     )
 
-    # Pegamos o texto gerado da estrutura de Responses
-    html = ""
-    if hasattr(response, "output_text"):
-        html = response.output_text.strip()
-    
-    if not html:
-        # Fallback para percorrer a lista de output caso output_text não esteja disponível
-        for item in response.output or []:
-            for content in item.content or []:
-                if getattr(content, "text", None):
-                    html = content.text.strip()
-                    break
-            if html:
-                break
+    return {
+        "model": section.model,
+        "max_output_tokens": section.token_limit,
+        "input": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": f"auditoria_{section.name}",
+                "schema": fields_schema(list(section.fields)),
+                "strict": True,
+            }
+        },
+    }
+
+
+async def _generate_sections(mapped_data: Dict[str, Any], client: AsyncOpenAI) -> str:
+    """Requests every section at once and fills the template with the merged fields."""
+    responses = await asyncio.gather(
+        *(client.responses.create(**_section_request(section, mapped_data)) for section in AUDIT_SECTIONS)
+    )
+
+    fields: Dict[str, str] = {}
+    for response in responses:
+        fields.update(json.loads(_response_text(response)))
+
+    # A análise de viralização abre a conclusão, como no modo de chamada única
+    viralization = fields.pop(VIRALIZATION_FIELD, "")
+    fields["conclusao_html"] = viralization + fields.get("conclusao_html", "")
+    return AUDIT_TEMPLATE.render(fields)
 
+
+def _clean_html(html: str) -> str:
     # Remove markdown code blocks if the AI included them
     if html.startswith("```"):
         # Remove first line if it's ```html or ```
@@ -117,19 +250,46 @@ def generate_html(payload: Dict[str, Any]) -> str:
             lines = lines[:-1]
         html = "\n".join(lines).strip()
 
-    # Injeta o logo real no lugar do placeholder
-    html = html.replace("{{logo_url}}", assets["logo_uri"])
-
-    # Inject CSS into the <head>
-    css_style = f"<style>{assets['css']}</style>"
-    if "</head>" in html:
-        html = html.replace("</head>", f"{css_style}\n</head>")
-    else:
-        html = f"{css_style}\n{html}"
+    # Aponta o placeholder para o logo servido pelo RenderContext
+    html = html.replace("{{logo_url}}", LOGO_URL)
 
     return html
 
 
+def generate_html(payload: Dict[str, Any]) -> str:
+    client = get_client()
+    mapped_data = _map_form_data(payload)
+
+    if api_settings.openai_generation_mode == "html":
+        response = client.responses.create(**_html_request(mapped_data))
+        return _clean_html(_response_text(response))
+
+    if api_settings.openai_generation_mode == "sections":
+        # As seções rodam concorrentes no loop do LLM stage; esta thread só espera
+        from workers.services.llm_stage import get_llm_stage
+
+        future = get_llm_stage().submit(lambda async_client: _generate_sections(mapped_data, async_client))
+        return future.result()
+
+    response = client.responses.create(**_fields_request(mapped_data))
+    return AUDIT_TEMPLATE.render(json.loads(_response_text(response)))
+
+
+async def generate_html_async(payload: Dict[str, Any], client: AsyncOpenAI) -> str:
+    """Same as generate_html, on an AsyncOpenAI client owned by the caller's event loop."""
+    mapped_data = _map_form_data(payload)
+
+    if api_settings.openai_generation_mode == "html":
+        response = await client.responses.create(**_html_request(mapped_data))
+        return _clean_html(_response_text(response))
+
+    if api_settings.openai_generation_mode == "sections":
+        return await _generate_sections(mapped_data, client)
+
+    response = await client.responses.create(**_fields_request(mapped_data))
+    return AUDIT_TEMPLATE.render(json.loads(_response_text(response)))
+
+
 if __name__ == "__main__":
     # Payload de teste simulando as respostas do formulário
     test_payload = {
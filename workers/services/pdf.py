@@ -0,0 +1,227 @@
+import math
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+from weasyprint import CSS, HTML, default_url_fetcher
+from weasyprint.document import Document
+from weasyprint.formatting_structure import boxes
+from weasyprint.text.fonts import FontConfiguration
+
+from api.settings import api_settings
+
+
+ASSETS_DIR = Path(__file__).resolve().parents[2] / "assets"
+FONTS_DIR = ASSETS_DIR / "fonts"
+ASSETS_BASE_URL = ASSETS_DIR.as_uri() + "/"
+
+# URL relativa usada no template; resolvida contra ASSETS_BASE_URL
+LOGO_URL = "logo.svg"
+
+# Limites da página única (mesmos da busca binária original)
+MIN_PAGE_HEIGHT_MM = 400
+MAX_PAGE_HEIGHT_MM = 5000
+
+# WeasyPrint trabalha em CSS px (96 por polegada)
+PX_TO_MM = 25.4 / 96
+
+# Alturas distintas guardadas por processo (busca binária gera ~12 por PDF)
+PAGE_CSS_CACHE_SIZE = 256
+
+
+@dataclass
+class RenderResult:
+    document: Document
+    height_mm: int
+    layout_passes: int
+
+
+class RenderContext:
+    """
+    Per-process WeasyPrint resources built once and reused by every render:
+    the compiled auditoria.css, a shared FontConfiguration (with the optional
+    @font-face rules from assets/fonts/fonts.css) and the static assets served
+    from memory through a custom url_fetcher.
+    """
+
+    def __init__(self) -> None:
+        self.font_config = FontConfiguration()
+        self.image_cache: Dict = {}
+        self._resources: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        logo_path = ASSETS_DIR / LOGO_URL
+        self._resources[ASSETS_BASE_URL + LOGO_URL] = {
+            "string": logo_path.read_bytes(),
+            "mime_type": "image/svg+xml",
+            "path": str(logo_path),
+        }
+
+        self.stylesheets = []
+        fonts_css = FONTS_DIR / "fonts.css"
+        if fonts_css.exists():
+            self.stylesheets.append(self._load_css(fonts_css))
+        self.stylesheets.append(self._load_css(ASSETS_DIR / "auditoria.css"))
+
+    def _load_css(self, path: Path) -> CSS:
+        return CSS(
+            filename=str(path),
+            url_fetcher=self.url_fetcher,
+            font_config=self.font_config,
+            media_type="screen",
+        )
+
+    def url_fetcher(self, url: str, *args, **kwargs) -> Dict:
+        resource = self._resources.get(url)
+        if resource is not None:
+            return dict(resource)
+        return default_url_fetcher(url, *args, **kwargs)
+
+    def page_css(self, height_mm: int) -> CSS:
+        """Small stylesheet overriding the page size (replaces the --pageH var)."""
+        return _page_size_css(height_mm)
+
+    def render(self, html: str, height_mm: int) -> Document:
+        # FontConfiguration e os caches não são thread-safe. Serializar é
+        # intencional: no pool do render_pool cada processo roda um render por
+        # vez, então o lock só disputa quando render_pdf roda em thread local.
+        with self._lock:
+            document = HTML(
+                string=html,
+                base_url=ASSETS_BASE_URL,
+                url_fetcher=self.url_fetcher,
+            ).render(
+                font_config=self.font_config,
+                stylesheets=[*self.stylesheets, self.page_css(height_mm)],
+                media_type="screen",
+                cache=self.image_cache,
+            )
+        return document
+
+
+@lru_cache(maxsize=PAGE_CSS_CACHE_SIZE)
+def _page_size_css(height_mm: int) -> CSS:
+    return CSS(string=f"@page {{ size: 210mm {height_mm}mm; }}", media_type="screen")
+
+
+_context: Optional[RenderContext] = None
+_context_lock = threading.Lock()
+
+
+def get_render_context() -> RenderContext:
+    """Returns the process-wide render context, building it on first use."""
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                _context = RenderContext()
+    return _context
+
+
+def render_with_height(html: str, height_mm: int) -> Document:
+    """Lay out the audit HTML on a single page of the given height."""
+    return get_render_context().render(html, height_mm)
+
+
+def _fit_bottom(box) -> float:
+    """
+    Lowest edge that has to fit on the page for `box` not to break. Like the
+    WeasyPrint layout (box-decoration-break: slice), the trailing padding,
+    border and margin of block containers may run past the page end: only
+    their descendants' lines and leaf boxes count.
+    """
+    if not isinstance(box, boxes.BlockContainerBox) or isinstance(box, boxes.LineBox):
+        return box.position_y + box.margin_height()
+    if not box.children:
+        return box.content_box_y() + box.height
+
+    bottom = box.content_box_y()
+    for child in reversed(box.children):
+        # Nada dentro do filho passa da sua margem inferior: pula quem não muda o máximo
+        if child.position_y + child.margin_height() <= bottom:
+            continue
+        bottom = max(bottom, _fit_bottom(child))
+    return bottom
+
+
+def measure_content_height_mm(document: Document) -> int:
+    """
+    Reads the smallest page height that keeps the first page's content on one
+    page from its layout tree (Page._page_box; see the weasyprint pin in
+    pyproject.toml). Equals the binary search result, checked by
+    `python -m benchmarks.render --check-heights`.
+    """
+    page_box = document.pages[0]._page_box
+    content_top = page_box.content_box_y()
+    bottom = max([content_top] + [_fit_bottom(child) for child in page_box.children])
+
+    # Margens da página (zero no CSS atual, mas somadas por segurança)
+    height_px = bottom + (page_box.margin_height() - page_box.height - content_top)
+    return math.ceil(height_px * PX_TO_MM)
+
+
+def _search_single_page(html: str, low: int, high: int) -> RenderResult:
+    """Binary search for the smallest height that fits the document in one page."""
+    best_height = high
+    best_doc = None
+    passes = 0
+
+    while low <= high:
+        mid = (low + high) // 2
+        doc = render_with_height(html, mid)
+        passes += 1
+        if len(doc.pages) == 1:
+            best_height = mid
+            best_doc = doc
+            high = mid - 1
+        else:
+            low = mid + 1
+
+    if best_doc is None:
+        best_doc = render_with_height(html, best_height)
+        passes += 1
+
+    return RenderResult(document=best_doc, height_mm=best_height, layout_passes=passes)
+
+
+def render_single_page(html: str, height_mm: Optional[int] = None) -> RenderResult:
+    """
+    Renders the audit as one tall page.
+
+    In "measure" mode the document is laid out once on the tallest allowed page,
+    the content height is read from the layout tree and a single confirmation
+    render is done at that height. The binary search is only used when the
+    measured height does not produce exactly one page.
+
+    A known height (e.g. persisted by a previous attempt) is tried first.
+    """
+    if height_mm:
+        doc = render_with_height(html, height_mm)
+        if len(doc.pages) == 1:
+            return RenderResult(document=doc, height_mm=height_mm, layout_passes=1)
+        result = render_single_page(html)
+        result.layout_passes += 1
+        return result
+
+    if api_settings.pdf_height_strategy != "measure":
+        return _search_single_page(html, MIN_PAGE_HEIGHT_MM, MAX_PAGE_HEIGHT_MM)
+
+    tall_doc = render_with_height(html, MAX_PAGE_HEIGHT_MM)
+    if len(tall_doc.pages) != 1:
+        # Conteúdo maior que a página máxima: mesmo resultado da busca binária
+        return RenderResult(document=tall_doc, height_mm=MAX_PAGE_HEIGHT_MM, layout_passes=1)
+
+    height_mm = min(max(measure_content_height_mm(tall_doc), MIN_PAGE_HEIGHT_MM), MAX_PAGE_HEIGHT_MM)
+    if height_mm == MAX_PAGE_HEIGHT_MM:
+        return RenderResult(document=tall_doc, height_mm=height_mm, layout_passes=1)
+
+    doc = render_with_height(html, height_mm)
+    if len(doc.pages) == 1:
+        return RenderResult(document=doc, height_mm=height_mm, layout_passes=2)
+
+    print(f"PDF: altura medida ({height_mm}mm) gerou {len(doc.pages)} páginas, usando busca binária")
+    result = _search_single_page(html, height_mm + 1, MAX_PAGE_HEIGHT_MM)
+    result.layout_passes += 2
+    return result
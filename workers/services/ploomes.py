@@ -1,10 +1,40 @@
-import requests
 import re
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
+
+import redis
+
 from api.settings import api_settings
+from workers.services import http
+from workers.services.redis_client import get_redis
 
 PLOOMES_BASE_URL = "https://api2.ploomes.com"
+PROVIDER = "ploomes"  # rate limit / circuit breaker (provider_guard)
+
+# Cache compartilhado entre os workers (Redis)
+USERS_CACHE_KEY = "ploomes:users"  # hash email -> user id, recarregado em bloco
+USERS_SYNC_LOCK_KEY = "ploomes:users:sync"
+USER_MISS_PREFIX = "ploomes:user:miss:"
+CONTACT_CACHE_PREFIX = "ploomes:contact:"
+NEGATIVE_VALUE = "0"
+USERS_PAGE_SIZE = 100
+
+# Erro 400 de um negócio cujo ContactId não existe mais (contato excluído ou mesclado)
+CONTACT_ERROR_PATTERN = re.compile(r"contact|contato", re.IGNORECASE)
+
+# Vira False se o endpoint recusar $batch (evita a tentativa a cada lote)
+_batch_supported = True
+BATCH_UNSUPPORTED_STATUS = (404, 405, 501)
+
+class StaleContactError(Exception):
+    """Ploomes rejected a deal's ContactId: the contact was deleted or merged."""
 
+    def __init__(self, contact_id: int, status: int) -> None:
+        super().__init__(f"contato {contact_id} recusado pelo Ploomes ({status})")
+        self.contact_id = contact_id
+
+@lru_cache(maxsize=1)
 def get_headers() -> Dict[str, str]:
     if not api_settings.ploomes_user_key:
         raise ValueError("PLOOMES_USER_KEY not configured")
@@ -13,16 +43,88 @@ def get_headers() -> Dict[str, str]:
         "Content-Type": "application/json"
     }
 
-def get_user_id_by_email(email: str) -> Optional[int]:
+@dataclass
+class BatchOperation:
+    """One request of an OData $batch; `url` is relative to the API root, e.g. "Deals(1)"."""
+    method: str
+    url: str
+    body: Optional[Dict[str, Any]] = None
+
+@dataclass
+class BatchResult:
+    operation: BatchOperation
+    status: int
+    body: Any
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+def execute_batch(operations: List[BatchOperation]) -> List[BatchResult]:
     """
-    Finds a Ploomes user ID by email.
+    Sends independent operations as one OData JSON $batch request.
+    Returns one result per operation, in order; failed operations do not
+    raise (check `result.ok`). If the endpoint rejects $batch itself, the
+    operations are sent one by one with the same result format.
     """
-    url = f"{PLOOMES_BASE_URL}/Users"
+    global _batch_supported
+    if not operations:
+        return []
+    if not _batch_supported or len(operations) == 1:
+        return [_execute_single(op) for op in operations]
+
+    payload = {
+        "requests": [
+            {
+                "id": str(index),
+                "method": op.method,
+                "url": op.url,
+                "headers": {"Content-Type": "application/json"},
+                **({"body": op.body} if op.body is not None else {}),
+            }
+            for index, op in enumerate(operations)
+        ]
+    }
+    response = http.request(
+        PLOOMES_BASE_URL, "POST", "/$batch", json=payload, headers=get_headers(), provider=PROVIDER,
+        # Resposta esperada quando o $batch não existe: não conta para o circuit breaker
+        expected_status=BATCH_UNSUPPORTED_STATUS,
+    )
+
+    if response.status_code in BATCH_UNSUPPORTED_STATUS:
+        print(f"PLOOMES: $batch indisponível ({response.status_code}), enviando as operações em sequência")
+        _batch_supported = False
+        return [_execute_single(op) for op in operations]
+    response.raise_for_status()
+
+    by_id = {item.get("id"): item for item in response.json().get("responses", [])}
+    results = []
+    for index, op in enumerate(operations):
+        item = by_id.get(str(index))
+        if item is None:
+            # Resposta sem essa operação: tratamos como falha dela, não do lote
+            results.append(BatchResult(operation=op, status=0, body=None))
+        else:
+            results.append(BatchResult(operation=op, status=int(item.get("status", 0)), body=item.get("body")))
+    return results
+
+def _execute_single(op: BatchOperation) -> BatchResult:
+    response = http.request(PLOOMES_BASE_URL, op.method, f"/{op.url}", json=op.body, headers=get_headers(), provider=PROVIDER)
+    try:
+        body = response.json() if response.content else None
+    except ValueError:
+        body = response.text
+    return BatchResult(operation=op, status=response.status_code, body=body)
+
+def _normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+def _find_id_by_email(entity: str, email: str) -> Optional[int]:
     params = {
         "$select": "Id,Email",
         "$filter": f"Email eq '{email}'"
     }
-    response = requests.get(url, headers=get_headers(), params=params, timeout=10)
+    response = http.request(PLOOMES_BASE_URL, "GET", f"/{entity}", headers=get_headers(), params=params, provider=PROVIDER)
     response.raise_for_status()
     data = response.json()
     
@@ -31,23 +133,117 @@ def get_user_id_by_email(email: str) -> Optional[int]:
         return value[0].get("Id")
     return None
 
+def fetch_all_users() -> Dict[str, int]:
+    """
+    Lists every Ploomes user (email -> ID), paging with $top/$skip.
+    """
+    users: Dict[str, int] = {}
+    skip = 0
+    while True:
+        params = {
+            "$select": "Id,Email",
+            "$orderby": "Id",
+            "$top": USERS_PAGE_SIZE,
+            "$skip": skip,
+        }
+        response = http.request(PLOOMES_BASE_URL, "GET", "/Users", headers=get_headers(), params=params, provider=PROVIDER)
+        response.raise_for_status()
+        page = response.json().get("value", [])
+        for user in page:
+            if user.get("Email") and user.get("Id"):
+                users[_normalize_email(user["Email"])] = user["Id"]
+        if len(page) < USERS_PAGE_SIZE:
+            return users
+        skip += USERS_PAGE_SIZE
+
+def sync_users_cache() -> Optional[Dict[str, int]]:
+    """
+    Reloads the users hash in one go. Only one worker syncs at a time;
+    the others get None and fall back to a direct lookup.
+    """
+    cache = get_redis()
+    if not cache.set(USERS_SYNC_LOCK_KEY, 1, nx=True, ex=60):
+        return None
+    try:
+        users = fetch_all_users()
+        with cache.pipeline() as pipe:
+            pipe.delete(USERS_CACHE_KEY)
+            if users:
+                pipe.hset(USERS_CACHE_KEY, mapping=users)
+                pipe.expire(USERS_CACHE_KEY, api_settings.ploomes_users_cache_ttl)
+            pipe.execute()
+        print(f"PLOOMES: cache de usuários sincronizado ({len(users)} usuários)")
+        return users
+    finally:
+        cache.delete(USERS_SYNC_LOCK_KEY)
+
+def get_user_id_by_email(email: str) -> Optional[int]:
+    """
+    Finds a Ploomes user ID by email.
+    Served from the shared users cache; emails missing from it are looked
+    up once and remembered (also when not found, for a short time).
+    """
+    key = _normalize_email(email)
+    try:
+        cache = get_redis()
+        if cache.exists(USERS_CACHE_KEY):
+            user_id = cache.hget(USERS_CACHE_KEY, key)
+        else:
+            users = sync_users_cache()
+            user_id = users.get(key) if users is not None else None
+        if user_id:
+            return int(user_id)
+        if cache.exists(USER_MISS_PREFIX + key):
+            return None
+    except redis.RedisError as e:
+        print(f"PLOOMES CACHE ERROR: {e}")
+        return _find_id_by_email("Users", email)
+
+    # Usuário criado depois do último sync (ou inexistente)
+    user_id = _find_id_by_email("Users", email)
+    try:
+        if user_id:
+            # Só completa um hash existente (sem hash não haveria TTL)
+            if cache.exists(USERS_CACHE_KEY):
+                cache.hset(USERS_CACHE_KEY, key, user_id)
+        else:
+            cache.set(USER_MISS_PREFIX + key, 1, ex=api_settings.ploomes_negative_cache_ttl)
+    except redis.RedisError as e:
+        print(f"PLOOMES CACHE ERROR: {e}")
+    return user_id
+
+def cache_contact_id(email: str, contact_id: Optional[int]) -> None:
+    """Stores a contact lookup; None is kept only for the short negative TTL."""
+    try:
+        get_redis().set(
+            CONTACT_CACHE_PREFIX + _normalize_email(email),
+            contact_id or NEGATIVE_VALUE,
+            ex=api_settings.ploomes_contact_cache_ttl if contact_id else api_settings.ploomes_negative_cache_ttl,
+        )
+    except redis.RedisError as e:
+        print(f"PLOOMES CACHE ERROR: {e}")
+
+def invalidate_contact_id(email: str) -> None:
+    try:
+        get_redis().delete(CONTACT_CACHE_PREFIX + _normalize_email(email))
+    except redis.RedisError as e:
+        print(f"PLOOMES CACHE ERROR: {e}")
+
 def get_contact_id_by_email(email: str) -> Optional[int]:
     """
-    Finds a Ploomes contact ID by email.
+    Finds a Ploomes contact ID by email (cached by email).
     """
-    url = f"{PLOOMES_BASE_URL}/Contacts"
-    params = {
-        "$select": "Id,Email",
-        "$filter": f"Email eq '{email}'"
-    }
-    response = requests.get(url, headers=get_headers(), params=params, timeout=10)
-    response.raise_for_status()
-    data = response.json()
-    
-    value = data.get("value", [])
-    if value:
-        return value[0].get("Id")
-    return None
+    try:
+        cached = get_redis().get(CONTACT_CACHE_PREFIX + _normalize_email(email))
+    except redis.RedisError as e:
+        print(f"PLOOMES CACHE ERROR: {e}")
+        cached = None
+    if cached is not None:
+        return int(cached) or None
+
+    contact_id = _find_id_by_email("Contacts", email)
+    cache_contact_id(email, contact_id)
+    return contact_id
 
 def create_contact(name: str, email: str, phone: str = "") -> int:
     """
@@ -75,17 +271,18 @@ def create_contact(name: str, email: str, phone: str = "") -> int:
             }
         ]
     
-    url = f"{PLOOMES_BASE_URL}/Contacts"
-    response = requests.post(url, json=payload, headers=get_headers(), timeout=10)
+    response = http.request(PLOOMES_BASE_URL, "POST", "/Contacts", json=payload, headers=get_headers(), provider=PROVIDER)
     
-    if not response.ok:
+    if not response.is_success:
         print(f"PLOOMES CONTACT ERROR: {response.status_code} - {response.text}")
         response.raise_for_status()
         
     data = response.json()
     value = data.get("value", [])
     if value:
-        return value[0].get("Id")
+        contact_id = value[0].get("Id")
+        cache_contact_id(email, contact_id)
+        return contact_id
     raise ValueError(f"Failed to create contact in Ploomes: {data}")
 
 def create_deal(
@@ -96,6 +293,7 @@ def create_deal(
 ) -> int:
     """
     Creates a deal in Ploomes.
+    Raises StaleContactError when Ploomes no longer knows `contact_id`.
     """
     payload = {
         "Title": title,
@@ -114,11 +312,14 @@ def create_deal(
             }
         ]
         
-    url = f"{PLOOMES_BASE_URL}/Deals"
-    response = requests.post(url, json=payload, headers=get_headers(), timeout=10)
+    response = http.request(PLOOMES_BASE_URL, "POST", "/Deals", json=payload, headers=get_headers(), provider=PROVIDER)
 
-    if not response.ok:
+    if not response.is_success:
         print(f"PLOOMES DEAL ERROR: {response.status_code} - {response.text}")
+        if response.status_code == 404 or (
+            response.status_code == 400 and CONTACT_ERROR_PATTERN.search(response.text)
+        ):
+            raise StaleContactError(contact_id, response.status_code)
         response.raise_for_status()
 
     data = response.json()
@@ -127,15 +328,14 @@ def create_deal(
         return value[0].get("Id")
     raise ValueError(f"Failed to create deal in Ploomes: {data}")
 
-def update_deal(
+def update_deal_operation(
     deal_id: int, 
     stage_id: Optional[int] = None, 
     next_owner_id: Optional[int] = None,
     revenue_range: Optional[str] = None
-) -> None:
+) -> BatchOperation:
     """
-    Updates an existing deal in Ploomes.
-    Can update stage, next owner, and revenue range.
+    Builds the PATCH that updates an existing deal (stage, next owner, revenue range).
     """
     payload = {
         "OriginId": 110170856 # Garante que a origem seja mantida/setada no update
@@ -161,11 +361,23 @@ def update_deal(
     
     if other_properties:
         payload["OtherProperties"] = other_properties
-        
-    url = f"{PLOOMES_BASE_URL}/Deals({deal_id})"
-    response = requests.patch(url, json=payload, headers=get_headers(), timeout=10)
+
+    return BatchOperation(method="PATCH", url=f"Deals({deal_id})", body=payload)
+
+def update_deal(
+    deal_id: int, 
+    stage_id: Optional[int] = None, 
+    next_owner_id: Optional[int] = None,
+    revenue_range: Optional[str] = None
+) -> None:
+    """
+    Updates an existing deal in Ploomes.
+    Can update stage, next owner, and revenue range.
+    """
+    op = update_deal_operation(deal_id, stage_id, next_owner_id, revenue_range)
+    response = http.request(PLOOMES_BASE_URL, op.method, f"/{op.url}", json=op.body, headers=get_headers(), provider=PROVIDER)
     
-    if not response.ok:
+    if not response.is_success:
         print(f"PLOOMES UPDATE ERROR: {response.status_code} - {response.text}")
         response.raise_for_status()
 
@@ -216,18 +428,18 @@ def map_revenue_to_ploomes_id(revenue_text: str) -> Optional[int]:
     return None
 
 
-def update_contact(contact_id: int, revenue_range: Optional[str] = None) -> None:
+def update_contact_operation(contact_id: int, revenue_range: Optional[str] = None) -> Optional[BatchOperation]:
     """
-    Updates a contact in Ploomes with revenue range.
-    Revenue field is stored in the Contact, not the Deal.
+    Builds the PATCH that stores the revenue range in the contact
+    (None when there is nothing to update).
     """
     if not revenue_range:
-        return
+        return None
     
     revenue_id = map_revenue_to_ploomes_id(revenue_range)
     if not revenue_id:
         print(f"⚠️  Não foi possível atualizar faturamento: mapeamento falhou para '{revenue_range}'")
-        return
+        return None
     
     # Try array format (like Deal updates)
     payload = {
@@ -239,9 +451,19 @@ def update_contact(contact_id: int, revenue_range: Optional[str] = None) -> None
         ]
     }
     
-    url = f"{PLOOMES_BASE_URL}/Contacts({contact_id})"
-    response = requests.patch(url, json=payload, headers=get_headers(), timeout=10)
+    return BatchOperation(method="PATCH", url=f"Contacts({contact_id})", body=payload)
+
+def update_contact(contact_id: int, revenue_range: Optional[str] = None) -> None:
+    """
+    Updates a contact in Ploomes with revenue range.
+    Revenue field is stored in the Contact, not the Deal.
+    """
+    op = update_contact_operation(contact_id, revenue_range)
+    if op is None:
+        return
+
+    response = http.request(PLOOMES_BASE_URL, op.method, f"/{op.url}", json=op.body, headers=get_headers(), provider=PROVIDER)
     
-    if not response.ok:
+    if not response.is_success:
         print(f"PLOOMES CONTACT UPDATE ERROR: {response.status_code} - {response.text}")
         response.raise_for_status()
@@ -0,0 +1,219 @@
+"""
+Per-provider rate limiter and circuit breaker shared by every worker process
+through Redis.
+
+- Token bucket (Lua script, atomic in Redis): PROVIDER_RATE_LIMITS sets the
+  rate (requests/s) and burst of each provider. A call waits for a token for
+  up to PROVIDER_MAX_WAIT seconds; beyond that the message is deferred.
+- Circuit breaker: PROVIDER_CIRCUIT_FAILURES failures (timeouts, 429, 5xx)
+  within the last PROVIDER_CIRCUIT_WINDOW seconds (a sliding window that
+  successes do not reset, so a provider failing every other call still
+  trips it) open the circuit for PROVIDER_CIRCUIT_COOLDOWN seconds. Calls
+  fail fast while it is open; after the cooldown a single probe call is let
+  through (half-open) and its outcome closes or reopens the circuit.
+
+Both raise ProviderUnavailable, a dramatiq Retry with the delay until the
+provider should be tried again. ProviderDeferralMiddleware keeps those
+deferrals from consuming the actor's max_retries.
+"""
+import math
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import redis
+from dramatiq import Middleware, Retry
+
+from api.settings import api_settings
+from workers.services.redis_client import get_redis
+
+
+PROVIDERS = ("woovi", "botconversa", "ploomes")
+
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+# Adiamentos por mensagem que não contam como retry (depois disso, contam)
+MAX_DEFERRALS = 50
+
+
+class ProviderUnavailable(Retry):
+    """The provider is rate limited or its circuit is open; retry after `delay` ms."""
+
+    def __init__(self, provider: str, reason: str, retry_after: float) -> None:
+        super().__init__(
+            f"{provider} indisponível ({reason}), nova tentativa em {retry_after:.1f}s",
+            delay=max(1000, int(retry_after * 1000)),
+        )
+        self.provider = provider
+        self.reason = reason
+
+
+def _key(provider: str, name: str) -> str:
+    return f"provider:{provider}:{name}"
+
+
+def _limits(provider: str) -> Dict[str, float]:
+    limits = api_settings.provider_rate_limits.get(provider, {})
+    return {"rate": float(limits.get("rate", 5)), "burst": float(limits.get("burst", 10))}
+
+
+def _count(provider: str, counter: str) -> None:
+    try:
+        get_redis().hincrby(_key(provider, "stats"), counter, 1)
+    except redis.RedisError:
+        pass
+
+
+def acquire_token(provider: str, max_wait: Optional[float] = None) -> None:
+    """Blocks until the provider's bucket has a token (up to `max_wait`, default PROVIDER_MAX_WAIT)."""
+    limits = _limits(provider)
+    deadline = time.monotonic() + (api_settings.provider_max_wait if max_wait is None else max_wait)
+    while True:
+        try:
+            wait = float(get_redis().eval(
+                TOKEN_BUCKET_SCRIPT, 1, _key(provider, "bucket"), limits["rate"], limits["burst"]
+            ))
+        except redis.RedisError as e:
+            # Sem Redis não há coordenação: seguimos sem limitar
+            print(f"PROVIDER GUARD ERROR: {e}")
+            return
+        if wait <= 0:
+            return
+        if time.monotonic() + wait > deadline:
+            _count(provider, "throttled")
+            raise ProviderUnavailable(provider, "rate limit", wait)
+        _count(provider, "waited")
+        time.sleep(wait)
+
+
+def before_call(provider: str, max_wait: Optional[float] = None) -> None:
+    """Fails fast while the circuit is open; lets one probe through when half-open."""
+    try:
+        cache = get_redis()
+        with cache.pipeline(transaction=False) as pipe:
+            pipe.pttl(_key(provider, "open"))
+            pipe.exists(_key(provider, "tripped"))
+            open_ttl, tripped = pipe.execute()
+        if open_ttl and open_ttl > 0:
+            _count(provider, "rejected")
+            raise ProviderUnavailable(provider, "circuito aberto", open_ttl / 1000)
+        if tripped:
+            # Meio-aberto: só uma chamada de teste por vez
+            if not cache.set(_key(provider, "probe"), 1, nx=True, ex=int(api_settings.http_read_timeout) + 5):
+                _count(provider, "rejected")
+                raise ProviderUnavailable(provider, "circuito meio-aberto", api_settings.provider_circuit_cooldown / 2)
+    except redis.RedisError as e:
+        print(f"PROVIDER GUARD ERROR: {e}")
+        return
+    acquire_token(provider, max_wait=max_wait)
+
+
+def record_success(provider: str) -> None:
+    """Closes a half-open circuit; the failure window is left alone."""
+    try:
+        get_redis().delete(_key(provider, "tripped"), _key(provider, "probe"))
+    except redis.RedisError as e:
+        print(f"PROVIDER GUARD ERROR: {e}")
+
+
+def record_failure(provider: str) -> None:
+    window = api_settings.provider_circuit_window
+    now = time.time()
+    try:
+        cache = get_redis()
+        _count(provider, "failures")
+        # Janela deslizante: uma entrada por falha, as mais antigas que a janela saem
+        with cache.pipeline() as pipe:
+            pipe.exists(_key(provider, "tripped"))
+            pipe.zadd(_key(provider, "failure_window"), {uuid.uuid4().hex: now})
+            pipe.zremrangebyscore(_key(provider, "failure_window"), "-inf", now - window)
+            pipe.zcard(_key(provider, "failure_window"))
+            pipe.expire(_key(provider, "failure_window"), window)
+            half_open, _, _, failures, _ = pipe.execute()
+        if half_open or failures >= api_settings.provider_circuit_failures:
+            _trip(cache, provider)
+    except redis.RedisError as e:
+        print(f"PROVIDER GUARD ERROR: {e}")
+
+
+def _trip(cache: redis.Redis, provider: str) -> None:
+    cooldown = api_settings.provider_circuit_cooldown
+    with cache.pipeline() as pipe:
+        pipe.set(_key(provider, "open"), 1, ex=cooldown)
+        # "tripped" sobrevive ao cooldown: enquanto existir, o circuito está meio-aberto
+        pipe.set(_key(provider, "tripped"), 1, ex=cooldown * 10)
+        pipe.delete(_key(provider, "failure_window"), _key(provider, "probe"))
+        pipe.hincrby(_key(provider, "stats"), "trips", 1)
+        pipe.execute()
+    print(f"PROVIDER GUARD: circuito de {provider} aberto por {cooldown}s")
+
+
+def provider_state(provider: str) -> Dict[str, Any]:
+    cache = get_redis()
+    limits = _limits(provider)
+    open_ttl = cache.pttl(_key(provider, "open"))
+    if open_ttl and open_ttl > 0:
+        circuit = "open"
+    elif cache.exists(_key(provider, "tripped")):
+        circuit = "half_open"
+    else:
+        circuit = "closed"
+
+    bucket = cache.hmget(_key(provider, "bucket"), "tokens", "ts")
+    tokens: Optional[float] = None
+    if bucket[0] is not None:
+        elapsed = max(0.0, time.time() - float(bucket[1]))
+        tokens = min(limits["burst"], float(bucket[0]) + elapsed * limits["rate"])
+
+    return {
+        "circuit": circuit,
+        "retry_after_s": math.ceil(open_ttl / 1000) if open_ttl and open_ttl > 0 else 0,
+        "recent_failures": cache.zcount(
+            _key(provider, "failure_window"), time.time() - api_settings.provider_circuit_window, "+inf"
+        ),
+        "rate_per_s": limits["rate"],
+        "burst": limits["burst"],
+        "tokens": round(tokens, 2) if tokens is not None else limits["burst"],
+        "counters": {k: int(v) for k, v in cache.hgetall(_key(provider, "stats")).items()},
+    }
+
+
+def provider_states() -> Dict[str, Dict[str, Any]]:
+    return {provider: provider_state(provider) for provider in PROVIDERS}
+
+
+class ProviderDeferralMiddleware(Middleware):
+    """
+    Messages deferred by ProviderUnavailable go back to the queue with the
+    provider's delay without using up max_retries (up to MAX_DEFERRALS per
+    message). Must be added after Retries, so its hook runs first.
+    """
+
+    def after_process_message(self, broker, message, *, result=None, exception=None):
+        if not isinstance(exception, ProviderUnavailable):
+            return
+        deferrals = message.options.get("provider_deferrals", 0)
+        if deferrals >= MAX_DEFERRALS:
+            return
+        message.options["provider_deferrals"] = deferrals + 1
+        # O Retries incrementa logo em seguida: o saldo fica igual
+        message.options["retries"] = message.options.get("retries", 0) - 1
+        print(f"PROVIDER GUARD: {message.actor_name} adiado ({exception})")
@@ -0,0 +1,47 @@
+import threading
+from typing import Optional
+
+import redis
+import redis.asyncio as redis_async
+
+from api.settings import api_settings
+
+
+_client: Optional[redis.Redis] = None
+_client_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """
+    Process-wide Redis client for caches and counters (REDIS_URL, falling back
+    to the Dramatiq broker URL). Thread-safe; connections come from its pool.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = redis.Redis.from_url(
+                    api_settings.redis_url or api_settings.dramatiq_broker_url,
+                    decode_responses=True,
+                    socket_connect_timeout=2,
+                    socket_timeout=2,
+                )
+    return _client
+
+
+_async_client: Optional[redis_async.Redis] = None
+
+
+def get_async_redis() -> redis_async.Redis:
+    """
+    asyncio Redis client for the API process (pub/sub streams). Created on
+    first use inside the server's event loop.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = redis_async.Redis.from_url(
+            api_settings.redis_url or api_settings.dramatiq_broker_url,
+            decode_responses=True,
+            socket_connect_timeout=2,
+        )
+    return _async_client
@@ -0,0 +1,300 @@
+"""
+Dedicated pool of render processes for the WeasyPrint layout.
+
+The Dramatiq actor sends the HTML and blocks on a Future until the PDF bytes
+come back, so the GIL-heavy layout runs outside the worker threads. Each
+render process keeps its own warm RenderContext and is recycled after
+PDF_RENDER_MAX_JOBS jobs or when its RSS passes PDF_RENDER_MAX_RSS_MB.
+"""
+import atexit
+import itertools
+import multiprocessing
+import os
+import resource
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from typing import Any, Dict, Optional, Tuple
+
+from api.settings import api_settings
+
+
+# Flags de cancelamento compartilhadas, indexadas por job_id % CANCEL_SLOTS
+CANCEL_SLOTS = 4096
+# Valor do slot de um processo ocioso
+IDLE = -1
+
+
+@dataclass
+class RenderedPdf:
+    pdf: bytes
+    height_mm: int
+    layout_passes: int
+    queue_wait_ms: float
+    render_ms: float
+    peak_rss_mb: float  # pico deste job (VmHWM zerado antes do render)
+    pid: int
+
+
+def _current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return _peak_rss_mb()
+
+
+def _reset_peak_rss() -> None:
+    # "5" zera o VmHWM do processo (Linux >= 4.0); sem isso o pico é o da vida toda
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    # ru_maxrss é em KB no Linux (pico desde o início do processo)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _render(html: str, height_mm: Optional[int], enqueued_at: float) -> RenderedPdf:
+    from workers.services.pdf import render_single_page
+
+    _reset_peak_rss()
+    started = time.time()
+    rendered = render_single_page(html, height_mm=height_mm)
+    pdf = rendered.document.write_pdf()
+    return RenderedPdf(
+        pdf=pdf,
+        height_mm=rendered.height_mm,
+        layout_passes=rendered.layout_passes,
+        queue_wait_ms=(started - enqueued_at) * 1000,
+        render_ms=(time.time() - started) * 1000,
+        peak_rss_mb=_peak_rss_mb(),
+        pid=os.getpid(),
+    )
+
+
+def _worker_main(task_queue, results, claimed, cancelled, max_jobs: int, max_rss_mb: int) -> None:
+    from workers.services.pdf import get_render_context
+
+    get_render_context()
+    jobs = 0
+    while True:
+        item = task_queue.get()
+        if item is None:
+            break
+
+        job_id, html, height_mm, enqueued_at = item
+        # Escrito em memória compartilhada antes de tudo: se o processo morrer
+        # daqui em diante, o dispatcher sabe qual job falhar
+        claimed.value = job_id
+        if cancelled[job_id % CANCEL_SLOTS]:
+            # Expirou na fila (RenderPool.render deu timeout): nem começa
+            claimed.value = IDLE
+            continue
+
+        try:
+            results.send(("done", job_id, _render(html, height_mm, enqueued_at)))
+        except Exception as exc:  # noqa: BLE001
+            results.send(("error", job_id, f"{type(exc).__name__}: {exc}"))
+        claimed.value = IDLE
+
+        jobs += 1
+        if jobs >= max_jobs or _current_rss_mb() > max_rss_mb:
+            break
+
+    # Saída limpa: o dispatcher recebe EOF no pipe e recicla o processo
+    results.close()
+
+
+class RenderPool:
+    """
+    Each render process has its own result pipe (no lock shared between
+    processes, so a killed process cannot wedge the others) and a shared
+    slot with the job it is running. EOF on a pipe means the process exited:
+    a clean exit is a recycle, anything else fails the claimed job at once.
+    """
+
+    def __init__(self, processes: int, max_jobs: int, max_rss_mb: int) -> None:
+        self._ctx = multiprocessing.get_context("spawn")
+        self._tasks = self._ctx.Queue()
+        self._cancelled = self._ctx.RawArray("b", CANCEL_SLOTS)
+        self._max_jobs = max_jobs
+        self._max_rss_mb = max_rss_mb
+
+        self._ids = itertools.count()
+        self._pending: Dict[int, Future] = {}
+        self._processes: Dict[int, multiprocessing.process.BaseProcess] = {}
+        self._results: Dict[int, Connection] = {}  # pid -> pipe de resultados
+        self._claimed: Dict[int, Any] = {}  # pid -> job_id em andamento (memória compartilhada)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        for _ in range(processes):
+            self._spawn()
+
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="render-pool-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    def _spawn(self) -> None:
+        reader, writer = self._ctx.Pipe(duplex=False)
+        claimed = self._ctx.RawValue("q", IDLE)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                self._tasks, writer, claimed, self._cancelled,
+                self._max_jobs, self._max_rss_mb,
+            ),
+            daemon=True,
+        )
+        process.start()
+        # Só o filho escreve: sem esta cópia aberta, a morte dele vira EOF
+        writer.close()
+        self._processes[process.pid] = process
+        self._results[process.pid] = reader
+        self._claimed[process.pid] = claimed
+
+    def _submit(self, html: str, height_mm: Optional[int]) -> Tuple[int, Future]:
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Render pool is closed")
+            job_id = next(self._ids)
+            self._pending[job_id] = future
+            self._cancelled[job_id % CANCEL_SLOTS] = 0
+        self._tasks.put((job_id, html, height_mm, time.time()))
+        return job_id, future
+
+    def submit(self, html: str, height_mm: Optional[int] = None) -> Future:
+        return self._submit(html, height_mm)[1]
+
+    def render(
+        self, html: str, height_mm: Optional[int] = None, timeout: Optional[float] = None
+    ) -> RenderedPdf:
+        job_id, future = self._submit(html, height_mm)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._cancel(job_id)
+            raise
+
+    def _cancel(self, job_id: int) -> None:
+        """
+        Drops a timed-out job so the retry does not compete with it: a queued
+        job is skipped by the render process, a running one has its process
+        terminated (and replaced by the dispatcher).
+        """
+        with self._lock:
+            self._pending.pop(job_id, None)
+            # Flag antes de olhar os slots; o worker grava o slot antes de ler a flag
+            self._cancelled[job_id % CANCEL_SLOTS] = 1
+            for pid, claimed in self._claimed.items():
+                if claimed.value == job_id:
+                    print(f"RENDER POOL: job {job_id} expirou, encerrando processo {pid}")
+                    self._processes[pid].terminate()
+                    break
+
+    def _dispatch(self) -> None:
+        while not self._closed:
+            with self._lock:
+                pids = {conn: pid for pid, conn in self._results.items()}
+
+            for conn in wait(list(pids), timeout=1):
+                pid = pids[conn]
+                try:
+                    kind, job_id, value = conn.recv()
+                except (EOFError, OSError):
+                    with self._lock:
+                        self._replace(pid)
+                    continue
+
+                with self._lock:
+                    future = self._pending.pop(job_id, None)
+                if future is None:
+                    continue
+                if kind == "done":
+                    future.set_result(value)
+                else:
+                    future.set_exception(RuntimeError(value))
+
+    def _replace(self, pid: int) -> None:
+        """Recycles an exited render process; a job it had claimed fails right away."""
+        process = self._processes.pop(pid, None)
+        if process is None:
+            return
+        self._results.pop(pid).close()
+        job_id = self._claimed.pop(pid).value
+        process.join(timeout=5)
+
+        future = self._pending.pop(job_id, None) if job_id != IDLE else None
+        if future is not None:
+            future.set_exception(
+                RuntimeError(f"Render process {pid} exited with code {process.exitcode}")
+            )
+        if self._closed:
+            return
+        if process.exitcode == 0:
+            print(f"RENDER POOL: processo {pid} reciclado")
+        else:
+            # e.g. OOM kill ou timeout (_cancel)
+            print(f"RENDER POOL: processo {pid} morreu (exit {process.exitcode}), substituindo")
+        self._spawn()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            processes = list(self._processes.values())
+        for _ in processes:
+            self._tasks.put(None)
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+_pool: Optional[RenderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> RenderPool:
+    """Returns the render pool of this worker process, starting it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RenderPool(
+                    processes=api_settings.pdf_render_processes or os.cpu_count() or 1,
+                    max_jobs=api_settings.pdf_render_max_jobs,
+                    max_rss_mb=api_settings.pdf_render_max_rss_mb,
+                )
+                atexit.register(_pool.close)
+    return _pool
+
+
+def render_pdf(html: str, height_mm: Optional[int] = None) -> RenderedPdf:
+    """
+    Renders the audit HTML into PDF bytes. Uses the render pool unless
+    PDF_RENDER_PROCESSES is 0, in which case it renders in the calling thread.
+    `height_mm` is a known page height to try before measuring.
+    """
+    if api_settings.pdf_render_processes == 0:
+        return _render(html, height_mm, time.time())
+    return get_render_pool().render(
+        html, height_mm=height_mm, timeout=api_settings.pdf_render_timeout
+    )
@@ -1,13 +1,68 @@
-import requests
-from typing import Any, Dict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
 from api.settings import api_settings
+from workers.services import http
 
 WOOVI_PROD_URL = "https://api.woovi.com/api/v1"
 WOOVI_SANDBOX_URL = "https://api.woovi-sandbox.com/api/v1"
+PROVIDER = "woovi"  # rate limit / circuit breaker (provider_guard)
 
-def create_pix_charge(charge_data: Dict[str, Any]) -> Dict[str, Any]:
+def build_charge_payload(charge: Any) -> Dict[str, Any]:
+    """
+    Woovi charge payload for a Charge row.
+    """
+    return {
+        "correlationID": charge.correlation_id,
+        "value": charge.value,
+        "customer": {
+            "name": charge.customer_name,
+            "taxID": charge.customer_tax_id,
+            "email": charge.customer_email,
+            "phone": charge.customer_phone,
+        },
+    }
+
+def charge_fields(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Maps a Woovi charge response to the Charge columns
+    (br_code, qr_code_url, payment_link_url, expires_at).
+    """
+    # A Woovi retorna {"charge": {...}}. Se por algum erro de rede ou conflito buscarmos
+    # novamente, garantimos que pegamos o objeto interno.
+    charge_result = result.get("charge") if isinstance(result, dict) and "charge" in result else result
+
+    # Parse da data de expiração (formato: "2021-04-01T17:28:51.882Z")
+    expires_at = None
+    expires_date_str = charge_result.get("expiresDate")
+    if expires_date_str:
+        expires_at = datetime.fromisoformat(expires_date_str.replace("Z", "+00:00"))
+
+    return {
+        "br_code": charge_result.get("brCode"),
+        "qr_code_url": charge_result.get("qrCodeImage"),
+        "payment_link_url": charge_result.get("paymentLinkUrl"),
+        "expires_at": expires_at,
+    }
+
+def log_time_to_qr(charge: Any, path: str) -> None:
+    """
+    Logs how long the customer waited for the QR code, from charge creation
+    to br_code stored ("fast path" in the request or "fila" via the actor).
+    """
+    created_at = charge.created_at
+    if created_at is None:
+        return
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    elapsed_ms = (datetime.now(timezone.utc) - created_at).total_seconds() * 1000
+    print(f"CHECKOUT: time-to-QR {elapsed_ms:.0f}ms ({path}) charge={charge.id}")
+
+def create_pix_charge(charge_data: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
     """
     Creates a Pix charge in Woovi.
+    `deadline` (time.monotonic() value) bounds the whole call, including the
+    rate limiter wait and the lookup of an existing charge, e.g. for the
+    checkout fast path.
     """
     if not api_settings.woovi_app_id:
         raise ValueError("WOOVI_APP_ID not configured")
@@ -29,23 +84,20 @@ def create_pix_charge(charge_data: Dict[str, Any]) -> Dict[str, Any]:
     #   "customer": { "name": "...", "taxID": "...", "email": "...", "phone": "..." }
     # }
     
-    response = requests.post(
-        f"{base_url}/charge",
-        json=charge_data,
-        headers=headers,
-        timeout=10
+    response = http.request(
+        base_url, "POST", "/charge", json=charge_data, headers=headers, provider=PROVIDER, deadline=deadline
     )
     
-    if not response.ok:
+    if not response.is_success:
         # Se já existe, tentamos buscar a cobrança existente
         if response.status_code == 400 and "Já existe uma cobrança" in response.text:
-            return get_pix_charge(charge_data["correlationID"])
+            return get_pix_charge(charge_data["correlationID"], deadline=deadline)
         print(f"WOOVI ERROR ({response.status_code}): {response.text}")
     
     response.raise_for_status()
     return response.json()
 
-def get_pix_charge(correlation_id: str) -> Dict[str, Any]:
+def get_pix_charge(correlation_id: str, deadline: Optional[float] = None) -> Dict[str, Any]:
     """
     Fetches a charge from Woovi by its correlationID.
     """
@@ -61,10 +113,8 @@ def get_pix_charge(correlation_id: str) -> Dict[str, Any]:
     }
     
     # Woovi GET /charge/{correlationID}
-    response = requests.get(
-        f"{base_url}/charge/{correlation_id}",
-        headers=headers,
-        timeout=10
+    response = http.request(
+        base_url, "GET", f"/charge/{correlation_id}", headers=headers, provider=PROVIDER, deadline=deadline
     )
     
     response.raise_for_status()
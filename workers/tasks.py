@@ -1,55 +1,110 @@
-from datetime import datetime
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 import dramatiq
-import re
-from dramatiq.brokers.redis import RedisBroker
+from dramatiq import Retry
+from dramatiq.middleware import Retries
 from dotenv import load_dotenv
-from weasyprint import HTML, CSS
 
 load_dotenv()
 
 from db.session import SessionLocal
 from db.models import WebhookRequest, Charge
 from workers.services.gdrive import upload_pdf
-from workers.services.openai_client import generate_html
-from workers.services.woovi import create_pix_charge
-from sqlalchemy import or_
+from workers.services.local_storage import read_local_copy, save_local_copy
+from workers.services.llm_stage import get_llm_stage
+from workers.services.openai_client import generate_html, generate_html_async
+from workers.services.render_pool import render_pdf
+from workers.services.woovi import build_charge_payload, charge_fields, create_pix_charge, log_time_to_qr
+from sqlalchemy import case, func, or_, update
 from workers.services.botconversa import ensure_subscriber_and_send_message
+from workers.services.charge_events import publish_charge
 from workers.services.ploomes import (
     create_contact, 
     create_deal, 
+    execute_batch,
     get_user_id_by_email, 
-    update_deal,
-    get_contact_id_by_email
+    invalidate_contact_id,
+    update_contact_operation,
+    update_deal_operation,
+    get_contact_id_by_email,
+    StaleContactError,
 )
 from api.settings import api_settings
+from workers.boot import WorkerBootMiddleware
+from workers.queue import ACTOR_REFS, broker
+from workers.services.provider_guard import ProviderDeferralMiddleware
 
 
-broker = RedisBroker(url=api_settings.dramatiq_broker_url)
+# Mesmo broker que a API usa para enfileirar por nome (workers/queue.py)
+broker.add_middleware(WorkerBootMiddleware())
+broker.add_middleware(ProviderDeferralMiddleware(), after=Retries)
 dramatiq.set_broker(broker)
 
+PROCESS_WEBHOOK_MAX_RETRIES = 3
+# Estágio assíncrono do LLM: mesmas tentativas e backoff dos retries do Dramatiq
+LLM_MAX_ATTEMPTS = PROCESS_WEBHOOK_MAX_RETRIES + 1
+LLM_RETRY_MIN_BACKOFF_MS = 15_000
+LLM_RETRY_MAX_BACKOFF_MS = 10 * 60_000
 
-OUTPUT_DIR = Path("/tmp/pdf-output")
-ASSETS_DIR = Path(__file__).resolve().parents[1] / "assets"
 
+def _llm_stale_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(seconds=api_settings.llm_stage_stale_after)
 
-@dramatiq.actor
-def process_webhook(webhook_id: int) -> None:
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+@dramatiq.actor(max_retries=PROCESS_WEBHOOK_MAX_RETRIES)
+def process_webhook(webhook_id: int) -> None:
+    """
+    Each stage is persisted on the WebhookRequest as soon as it completes
+    (start message, generated HTML, page height + PDF hash, Drive file ID),
+    so a retry or manual re-run resumes from the first incomplete stage.
+
+    With LLM_STAGE_MODE=async the HTML is generated on the LLM stage loop
+    and the actor returns with the row in "generating"; the stage re-enqueues
+    this actor when the HTML is stored, or with a backoff on failure. Messages
+    for a row still generating are dropped unless it went stale (see
+    recover_stale_generations).
+    """
     db = SessionLocal()
+    status = None
     try:
-        record = db.get(WebhookRequest, webhook_id)
-        if not record:
+        values = {"status": "processing"}
+        if api_settings.llm_stage_mode == "async":
+            # Quem muda a linha para "generating" é o único que chama o LLM
+            takes_llm = WebhookRequest.generated_html.is_(None)
+            values = {
+                "status": case((takes_llm, "generating"), else_="processing"),
+                "llm_started_at": case((takes_llm, func.now()), else_=WebhookRequest.llm_started_at),
+                "llm_attempts": case(
+                    (takes_llm, WebhookRequest.llm_attempts + 1), else_=WebhookRequest.llm_attempts
+                ),
+            }
+        # Não toca uma linha cuja geração está em andamento em algum worker
+        status = db.execute(
+            update(WebhookRequest)
+            .where(
+                WebhookRequest.id == webhook_id,
+                or_(
+                    WebhookRequest.status != "generating",
+                    WebhookRequest.llm_started_at.is_(None),
+                    WebhookRequest.llm_started_at < _llm_stale_cutoff(),
+                ),
+            )
+            .values(**values)
+            .returning(WebhookRequest.status)
+        ).scalar_one_or_none()
+        db.commit()
+        if status is None:
+            print(f"PIPELINE: webhook {webhook_id} inexistente ou com LLM em andamento, ignorando")
             return
 
-        record.status = "processing"
-        db.commit()
+        record = db.get(WebhookRequest, webhook_id)
 
         raw_data = record.payload.get("data", {}).get("data", {})
         name = raw_data.get("name", "Cliente")
-        email = raw_data.get("email", "")
+        email = record.email or ""
         
         # Tenta pegar o telefone para as notificações
         phone = None
@@ -58,47 +113,77 @@ def process_webhook(webhook_id: int) -> None:
             phone = last_charge.customer_phone
 
         # --- MENSAGEM INICIAL (FEEDBACK INSTANTÂNEO) ---
-        if phone:
+        if phone and not record.start_message_sent:
             try:
                 start_msg = (
                     f"Recebemos suas respostas do formulário com sucesso,{name}. 📝\n\n"
                     "Agora é só aguardar até o horário reservado para sua auditoria. Até lá!"
                 )
                 ensure_subscriber_and_send_message(phone=phone, first_name=name, message=start_msg)
+                record.start_message_sent = True
+                db.commit()
                 print(f"WHATSAPP: Feedback inicial enviado para {name}")
+            except Retry:
+                # BotConversa limitado ou com circuito aberto: adia a mensagem inteira
+                raise
             except Exception as e:
                 print(f"WHATSAPP START MSG ERROR: {e}")
 
-        # --- GERAÇÃO DO PDF (PROCESSO PESADO) ---
-        html = generate_html(record.payload)
+        # --- GERAÇÃO DO HTML (LLM) ---
+        if status == "generating":
+            # Libera a thread: o loop do LLM grava o HTML e reenfileira este actor
+            payload = record.payload
+            get_llm_stage().submit(
+                lambda client: _generate_html_stage(webhook_id, payload, client)
+            )
+            return
 
-        def render_with_height(height_mm: int):
-            modified_html = re.sub(r'--pageH:\s*\d+mm\s*;', f'--pageH: {height_mm}mm;', html)
-            return HTML(string=modified_html, base_url=str(ASSETS_DIR)).render(media_type="screen")
+        if not record.generated_html:
+            record.generated_html = generate_html(record.payload)
+            db.commit()
+        else:
+            print(f"PIPELINE: HTML já gerado para webhook {webhook_id}, pulando LLM")
+
+        # --- GERAÇÃO DO PDF (PROCESSO PESADO) + UPLOAD ---
+        if not record.drive_file_id:
+            insta = (record.instagram or "").replace(" ", "_")
+            filename = f"auditoria-{name}-@{insta if insta else webhook_id}-{webhook_id}.pdf"
+            local_dir = Path(api_settings.pdf_local_copy_dir) if api_settings.pdf_local_copy_dir else None
+
+            pdf = None
+            if local_dir and record.pdf_sha256:
+                pdf = read_local_copy(local_dir, filename, record.pdf_sha256)
+
+            if pdf is None:
+                rendered = render_pdf(record.generated_html, height_mm=record.page_height_mm)
+                print(
+                    f"PDF: altura {rendered.height_mm}mm definida com "
+                    f"{rendered.layout_passes} passes de layout (webhook {webhook_id}) | "
+                    f"fila {rendered.queue_wait_ms:.0f}ms, render {rendered.render_ms:.0f}ms, "
+                    f"pico RSS {rendered.peak_rss_mb:.0f}MB (pid {rendered.pid})"
+                )
+                pdf = rendered.pdf
+                record.page_height_mm = rendered.height_mm
+                record.pdf_sha256 = hashlib.sha256(pdf).hexdigest()
+                record.pdf_filename = filename
+                db.commit()
 
-        low, high = 400, 5000
-        best_height = high
-        
-        while low <= high:
-            mid = (low + high) // 2
-            doc = render_with_height(mid)
-            if len(doc.pages) == 1:
-                best_height = mid
-                high = mid - 1
+                if local_dir:
+                    save_local_copy(
+                        local_dir,
+                        pdf,
+                        filename,
+                        max_bytes=api_settings.pdf_local_copy_max_mb * 1024 * 1024,
+                        max_age_seconds=api_settings.pdf_local_copy_max_age_hours * 3600,
+                    )
             else:
-                low = mid + 1
+                print(f"PIPELINE: PDF local reaproveitado para webhook {webhook_id}")
 
-        insta = raw_data.get("instagram", "").strip().lstrip("@").strip().replace(" ", "_")
-        filename = f"auditoria-{name}-@{insta if insta else webhook_id}-{webhook_id}.pdf"
-        pdf_path = OUTPUT_DIR / filename
-        
-        final_doc = render_with_height(best_height)
-        final_doc.write_pdf(target=str(pdf_path))
-        drive_info = upload_pdf(pdf_path, filename)
+            drive_info = upload_pdf(pdf, filename)
+            record.drive_file_id = drive_info.get("id")
+            db.commit()
 
         record.status = "done"
-        record.pdf_filename = filename
-        record.drive_file_id = drive_info.get("id")
         record.error_message = None
         db.commit()
 
@@ -116,6 +201,18 @@ def process_webhook(webhook_id: int) -> None:
         #     except Exception as e:
         #         print(f"WHATSAPP FINISH MSG ERROR: {e}")
 
+    except Retry as exc:
+        # Adiamento (ProviderUnavailable): a mensagem volta para a fila, não é falha
+        db.rollback()
+        record = db.get(WebhookRequest, webhook_id)
+        if record:
+            if status == "generating":
+                # Adiado antes de chamar o LLM: a tentativa não conta
+                record.llm_attempts -= 1
+                record.llm_started_at = None
+            record.status = "deferred"
+            db.commit()
+        raise exc
     except Exception as exc:  # noqa: BLE001
         db.rollback()
         record = db.get(WebhookRequest, webhook_id)
@@ -123,10 +220,113 @@ def process_webhook(webhook_id: int) -> None:
             record.status = "failed"
             record.error_message = f"{type(exc).__name__}: {exc}"
             db.commit()
+        # Dramatiq retenta; os estágios já concluídos não são refeitos
+        raise exc
     finally:
         db.close()
 
 
+async def _generate_html_stage(webhook_id: int, payload: dict, client) -> None:
+    """Runs on the LLM stage event loop; DB work goes to a thread."""
+    try:
+        html = await generate_html_async(payload, client)
+    except Exception as exc:  # noqa: BLE001
+        await asyncio.to_thread(_retry_or_fail_generation, webhook_id, exc)
+        return
+    await asyncio.to_thread(_store_generated_html, webhook_id, html)
+
+
+def _store_generated_html(webhook_id: int, html: str) -> None:
+    db = SessionLocal()
+    try:
+        record = db.get(WebhookRequest, webhook_id)
+        if not record:
+            return
+        record.generated_html = html
+        record.status = "queued"
+        db.commit()
+    finally:
+        db.close()
+
+    # Retoma o pipeline a partir do render
+    process_webhook.send(webhook_id)
+
+
+def _retry_or_fail_generation(webhook_id: int, exc: Exception) -> None:
+    """
+    The actor already returned, so Dramatiq's retries do not cover the LLM
+    call: re-enqueue with an exponential backoff until LLM_MAX_ATTEMPTS
+    (counted on the row), like the thread mode's max_retries.
+    """
+    print(f"LLM STAGE ERROR (webhook {webhook_id}): {exc}")
+    db = SessionLocal()
+    try:
+        record = db.get(WebhookRequest, webhook_id)
+        if not record:
+            return
+        record.error_message = f"{type(exc).__name__}: {exc}"
+        if record.llm_attempts >= LLM_MAX_ATTEMPTS:
+            record.status = "failed"
+            db.commit()
+            return
+        record.status = "queued"
+        attempts = record.llm_attempts
+        db.commit()
+    finally:
+        db.close()
+
+    delay = min(LLM_RETRY_MIN_BACKOFF_MS * 2 ** (attempts - 1), LLM_RETRY_MAX_BACKOFF_MS)
+    print(f"LLM STAGE: webhook {webhook_id} reenfileirado em {delay / 1000:.0f}s (tentativa {attempts})")
+    process_webhook.send_with_options(args=(webhook_id,), delay=delay)
+
+
+def recover_stale_generations() -> int:
+    """
+    Recovers rows left in "generating" by a worker that died with the LLM
+    call in flight (nothing else would ever re-enqueue them). Called at
+    worker boot: each row gets a recover_stale_generation message delayed
+    until it is LLM_STAGE_STALE_AFTER old, so generations still running in
+    another worker are left alone. Returns the number of rows scheduled.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(WebhookRequest.id, WebhookRequest.llm_started_at).filter(
+            WebhookRequest.status == "generating"
+        ).all()
+    finally:
+        db.close()
+
+    now = datetime.now(timezone.utc)
+    stale_after = timedelta(seconds=api_settings.llm_stage_stale_after)
+    for webhook_id, llm_started_at in rows:
+        remaining = (llm_started_at + stale_after - now) if llm_started_at else timedelta(0)
+        # +1s: quando a mensagem chega a linha já passou do corte
+        recover_stale_generation.send_with_options(
+            args=(webhook_id,), delay=max(int(remaining.total_seconds() * 1000), 0) + 1000
+        )
+    return len(rows)
+
+
+@dramatiq.actor(max_retries=3)
+def recover_stale_generation(webhook_id: int) -> None:
+    db = SessionLocal()
+    try:
+        stale = db.query(WebhookRequest.id).filter(
+            WebhookRequest.id == webhook_id,
+            WebhookRequest.status == "generating",
+            or_(
+                WebhookRequest.llm_started_at.is_(None),
+                WebhookRequest.llm_started_at < _llm_stale_cutoff(),
+            ),
+        ).scalar()
+    finally:
+        db.close()
+
+    if stale:
+        print(f"LLM STAGE: webhook {webhook_id} parado em generating, retomando")
+        process_webhook.send(webhook_id)
+
+
 @dramatiq.actor(max_retries=3)
 def create_woovi_charge_task(charge_id: int) -> None:
     db = SessionLocal()
@@ -135,37 +335,16 @@ def create_woovi_charge_task(charge_id: int) -> None:
         if not charge:
             return
 
-        payload = {
-            "correlationID": charge.correlation_id,
-            "value": charge.value,
-            "customer": {
-                "name": charge.customer_name,
-                "taxID": charge.customer_tax_id,
-                "email": charge.customer_email,
-                "phone": charge.customer_phone,
-            },
-        }
-
-        result = create_pix_charge(payload)
-
-        # A Woovi retorna {"charge": {...}}. Se por algum erro de rede ou conflito buscarmos
-        # novamente, garantimos que pegamos o objeto interno.
-        charge_result = result.get("charge") if isinstance(result, dict) and "charge" in result else result
-        
-        # Mapeamento exato baseado no exemplo do usuário
-        charge.br_code = charge_result.get("brCode")
-        charge.qr_code_url = charge_result.get("qrCodeImage")
-        charge.payment_link_url = charge_result.get("paymentLinkUrl")
-        
-        # Parse da data de expiração (formato: "2021-04-01T17:28:51.882Z")
-        expires_date_str = charge_result.get("expiresDate")
-        if expires_date_str:
-            charge.expires_at = datetime.fromisoformat(expires_date_str.replace("Z", "+00:00"))
+        result = create_pix_charge(build_charge_payload(charge))
+        for field, value in charge_fields(result).items():
+            setattr(charge, field, value)
 
         print(f"WORKER SUCCESS: PIX gerado para {charge.correlation_id}")
         print(f"BRCODE: {charge.br_code[:50]}...")
             
         db.commit()
+        log_time_to_qr(charge, "fila")
+        publish_charge(charge)
     except Exception as exc:
         db.rollback()
         raise exc
@@ -250,6 +429,24 @@ def send_cal_booking_confirmation_whatsapp(phone: str, name: str) -> None:
         raise exc
 
 
+def _resolve_ploomes_contact(charge: Charge) -> int:
+    """Contact ID for the charge's customer: looked up by email, created when missing."""
+    # Busca no Ploomes pelo e-mail (evita duplicidade no CRM)
+    contact_id = get_contact_id_by_email(charge.customer_email)
+    if contact_id:
+        print(f"PLOOMES: Contato já existe no CRM (ID: {contact_id}). Reutilizando.")
+        return contact_id
+
+    # Se ainda não encontrou nem no Ploomes, cria um novo
+    contact_id = create_contact(
+        name=charge.customer_name,
+        email=charge.customer_email,
+        phone=charge.customer_phone
+    )
+    print(f"PLOOMES: Novo contato criado (ID: {contact_id})")
+    return contact_id
+
+
 @dramatiq.actor(max_retries=3)
 def track_purchase_ploomes_task(charge_id: int) -> None:
     db = SessionLocal()
@@ -265,33 +462,21 @@ def track_purchase_ploomes_task(charge_id: int) -> None:
 
         print(f"PLOOMES: Registrando compra para {charge.customer_name}")
         
-        # 1) Verifica se já temos o contato no nosso DB
-        contact_id = charge.ploomes_contact_id
-        
-        # 2) Se não tem no DB, busca no Ploomes pelo e-mail (evita duplicidade no CRM)
-        if not contact_id:
-            contact_id = get_contact_id_by_email(charge.customer_email)
-            if contact_id:
-                print(f"PLOOMES: Contato já existe no CRM (ID: {contact_id}). Reutilizando.")
-        
-        # 3) Se ainda não encontrou nem no Ploomes, cria um novo
-        if not contact_id:
-            contact_id = create_contact(
-                name=charge.customer_name,
-                email=charge.customer_email,
-                phone=charge.customer_phone
-            )
-            print(f"PLOOMES: Novo contato criado (ID: {contact_id})")
-        
-        # Salva o contact_id no DB
-        charge.ploomes_contact_id = contact_id
-        db.commit()
-        
-        deal_id = create_deal(
-            title=f"{charge.customer_name} - Auditoria Estratégica",
-            contact_id=contact_id,
-            stage_id=110128040
-        )
+        # 1) Verifica se já temos o contato no nosso DB (senão busca no Ploomes ou cria)
+        if not charge.ploomes_contact_id:
+            charge.ploomes_contact_id = _resolve_ploomes_contact(charge)
+            db.commit()
+
+        title = f"{charge.customer_name} - Auditoria Estratégica"
+        try:
+            deal_id = create_deal(title=title, contact_id=charge.ploomes_contact_id, stage_id=110128040)
+        except StaleContactError as e:
+            # Contato excluído ou mesclado no Ploomes: descarta o ID guardado e resolve uma vez de novo
+            print(f"PLOOMES: {e}, atualizando contato de {charge.customer_email}")
+            invalidate_contact_id(charge.customer_email)
+            charge.ploomes_contact_id = _resolve_ploomes_contact(charge)
+            db.commit()
+            deal_id = create_deal(title=title, contact_id=charge.ploomes_contact_id, stage_id=110128040)
         
         charge.ploomes_deal_id = deal_id
         db.commit()
@@ -326,42 +511,54 @@ def track_booking_ploomes_task(name: str, email: str, phone: str, organizer_emai
         next_owner_id = get_user_id_by_email(organizer_email)
         
         # 2) Try to get revenue data from webhook form submission
-        revenue_range = None
-        webhook = db.query(WebhookRequest).filter(
-            WebhookRequest.payload['data']['data']['email'].astext == email
-        ).order_by(WebhookRequest.created_at.desc()).first()
+        # Só a coluna: o payload JSONB não precisa ser lido
+        revenue_range = db.query(WebhookRequest.revenue_range).filter(
+            WebhookRequest.email == email
+        ).order_by(WebhookRequest.created_at.desc()).limit(1).scalar()
         
-        if webhook:
-            form_data = webhook.payload.get('data', {}).get('data', {})
-            revenue_range = form_data.get('faturamento_medio_atual')
-            if revenue_range:
-                print(f"PLOOMES: Faturamento encontrado no formulário: {revenue_range}")
+        if revenue_range:
+            print(f"PLOOMES: Faturamento encontrado no formulário: {revenue_range}")
         
-        # 3) Update existing Deal (stage and next owner)
-        try:
-            update_deal(
+        # 3) Deal (stage and next owner) + Contact (revenue range) são independentes: um único $batch
+        operations = [
+            update_deal_operation(
                 deal_id=charge.ploomes_deal_id,
                 stage_id=110128042,
                 next_owner_id=next_owner_id
             )
-            print(f"PLOOMES: Negócio {charge.ploomes_deal_id} atualizado para 'Agendado' ({name})")
-            
-            # 4) Update Contact with revenue range (if available)
-            if revenue_range and charge.ploomes_contact_id:
-                from workers.services.ploomes import update_contact
-                update_contact(
-                    contact_id=charge.ploomes_contact_id,
-                    revenue_range=revenue_range
-                )
-            
-        except Exception as api_exc:
-            # Se der 404 (Negócio excluído no Ploomes), não queremos que a fila trave
-            if "404" in str(api_exc):
-                print(f"PLOOMES WARNING: O negócio {charge.ploomes_deal_id} foi excluído manualmente no CRM. Ignorando update.")
+        ]
+        if revenue_range and charge.ploomes_contact_id:
+            contact_op = update_contact_operation(
+                contact_id=charge.ploomes_contact_id,
+                revenue_range=revenue_range
+            )
+            if contact_op:
+                operations.append(contact_op)
+
+        failures = []
+        for result in execute_batch(operations):
+            if result.ok:
+                print(f"PLOOMES: {result.operation.url} atualizado ({name})")
+            elif result.status == 404:
+                # Registro excluído manualmente no Ploomes: não queremos que a fila trave
+                print(f"PLOOMES WARNING: {result.operation.url} foi excluído manualmente no CRM. Ignorando update.")
+                if result.operation.url.startswith("Contacts("):
+                    invalidate_contact_id(email)
             else:
-                raise api_exc
+                print(f"PLOOMES BATCH ERROR: {result.operation.url} -> {result.status} {result.body}")
+                failures.append(result)
+
+        if failures:
+            # Os PATCHes são idempotentes: o retry reenvia o lote inteiro
+            raise RuntimeError(f"Ploomes batch: {len(failures)} de {len(operations)} operações falharam")
     except Exception as exc:
         print(f"PLOOMES BOOKING ERROR: {exc}")
         raise exc
     finally:
         db.close()
+
+
+# Cada handle de workers.queue precisa de um actor com o mesmo nome e fila
+for _ref in ACTOR_REFS:
+    if broker.get_actor(_ref.actor_name).queue_name != _ref.queue_name:
+        raise RuntimeError(f"{_ref}: actor declarado em outra fila")